@@ -1,107 +1,152 @@
-import sys
 import re
-
-from singleton import Singleton
-
-
-class Assembler(metaclass=Singleton):
+import os
+import argparse
+from types import MappingProxyType
+from concurrent.futures import ProcessPoolExecutor
+
+from rom_image import RomImage
+from assembler_cache import AssemblerCache
+import common_path
+from instrumentation import Instrumentation
+
+
+class Assembler:
+    COMMAND_LEN = 16
+    VAR_ADDRESS_BEGINNING = 16
+
+    # shared by every instance and never written to; each program's
+    # labels and variables go into its own names_map on top of it
+    predefined_names = MappingProxyType({
+        'R0': 0,
+        'R1': 1,
+        'R2': 2,
+        'R3': 3,
+        'R4': 4,
+        'R5': 5,
+        'R6': 6,
+        'R7': 7,
+        'R8': 8,
+        'R9': 9,
+        'R10': 10,
+        'R11': 11,
+        'R12': 12,
+        'R13': 13,
+        'R14': 14,
+        'R15': 15,
+        'SCREEN': 16384,
+        'KBD': 24576,
+        'SP': 0,
+        'LCL': 1,
+        'ARG': 2,
+        'THIS': 3,
+        'THAT': 4
+    })
+
+    comp_map = {
+        '0': '0101010',
+        '1': '0111111',
+        '-1': '0111010',
+        'D': '0001100',
+        'A': '0110000',
+        'M': '1110000',
+        '!D': '0001101',
+        '!A': '0110001',
+        '!M': '1110001',
+        '-D': '0001111',
+        '-A': '0110011',
+        '-M': '1110011',
+        'D+1': '0011111',
+        'A+1': '0110111',
+        'M+1': '1110111',
+        'D-1': '0001110',
+        'A-1': '0110010',
+        'M-1': '1110010',
+        'D+A': '0000010',
+        'D+M': '1000010',
+        'D-A': '0010011',
+        'D-M': '1010011',
+        'A-D': '0000111',
+        'M-D': '1000111',
+        'D&A': '0000000',
+        'D&M': '1000000',
+        'D|A': '0010101',
+        'D|M': '1010101',
+        'A+D': '0000010',
+        'M+D': '1000010',
+        'A&D': '0000000',
+        'M&D': '1000000',
+        'A|D': '0010101',
+        'M|D': '1010101'
+    }
+
+    dest_map = {
+        '': '000',
+        'M': '001',
+        'D': '010',
+        'MD': '011',
+        'A': '100',
+        'AM': '101',
+        'AD': '110',
+        'AMD': '111'
+    }
+
+    jump_map = {
+        '': '000',
+        'JGT': '001',
+        'JEQ': '010',
+        'JGE': '011',
+        'JLT': '100',
+        'JNE': '101',
+        'JLE': '110',
+        'JMP': '111'
+    }
+
+    a_command_format = f'0{COMMAND_LEN}b'
 
     def __init__(self):
-        self.COMMAND_LEN = 16
-        self.NEXT_VAR_ADDRESS = 16
-        self.names_map = {
-            'R0': 0,
-            'R1': 1,
-            'R2': 2,
-            'R3': 3,
-            'R4': 4,
-            'R5': 5,
-            'R6': 6,
-            'R7': 7,
-            'R8': 8,
-            'R9': 9,
-            'R10': 10,
-            'R11': 11,
-            'R12': 12,
-            'R13': 13,
-            'R14': 14,
-            'R15': 15,
-            'SCREEN': 16384,
-            'KBD': 24576,
-            'SP': 0,
-            'LCL': 1,
-            'ARG': 2,
-            'THIS': 3,
-            'THAT': 4
-        }
-
-        self.comp_map = {
-            '0': '0101010',
-            '1': '0111111',
-            '-1': '0111010',
-            'D': '0001100',
-            'A': '0110000',
-            'M': '1110000',
-            '!D': '0001101',
-            '!A': '0110001',
-            '!M': '1110001',
-            '-D': '0001111',
-            '-A': '0110011',
-            '-M': '1110011',
-            'D+1': '0011111',
-            'A+1': '0110111',
-            'M+1': '1110111',
-            'D-1': '0001110',
-            'A-1': '0110010',
-            'M-1': '1110010',
-            'D+A': '0000010',
-            'D+M': '1000010',
-            'D-A': '0010011',
-            'D-M': '1010011',
-            'A-D': '0000111',
-            'M-D': '1000111',
-            'D&A': '0000000',
-            'D&M': '1000000',
-            'D|A': '0010101',
-            'D|M': '1010101'
-        }
-
-        self.dest_map = {
-            '': '000',
-            'M': '001',
-            'D': '010',
-            'MD': '011',
-            'A': '100',
-            'AM': '101',
-            'AD': '110',
-            'AMD': '111'
-        }
-
-        self.jump_map = {
-            '': '000',
-            'JGT': '001',
-            'JEQ': '010',
-            'JGE': '011',
-            'JLT': '100',
-            'JNE': '101',
-            'JLE': '110',
-            'JMP': '111'
-        }
-
-    def delete_comments_and_labels(self, lines):
-        lines_out = []
-
+        self.NEXT_VAR_ADDRESS = None
+        self.names_map = None
+        self.reset()
+
+    def reset(self):
+        self.NEXT_VAR_ADDRESS = self.VAR_ADDRESS_BEGINNING
+        self.names_map = dict(self.predefined_names)
+
+    @classmethod
+    def _build_c_command_map(cls):
+        # every legal dest=comp;jump combination, encoded once
+        c_command_map = {}
+
+        for comp_str, comp in cls.comp_map.items():
+            for dest_str, dest in cls.dest_map.items():
+                for jump_str, jump in cls.jump_map.items():
+                    line = comp_str
+                    if dest_str != '':
+                        line = dest_str + '=' + line
+                    if jump_str != '':
+                        line = line + ';' + jump_str
+                    c_command_map[line] = '111' + comp + dest + jump
+
+        return c_command_map
+
+    @staticmethod
+    def delete_comments(lines):
         for line in lines:
 
             # delete comment
-            comment = re.search('//', line)
-            if comment is not None:
-                line = line[:comment.start()]
+            comment = line.find('//')
+            if comment != -1:
+                line = line[:comment]
 
             # check if empty
             line = line.strip()
-            if line == '':
-                continue
+            if line != '':
+                yield line
+
+    def delete_comments_and_labels(self, lines):
+        lines_out = []
+
+        for line in self.delete_comments(lines):
 
             # check if label
             if line[0] == '(' and line[-1] == ')':
@@ -131,63 +176,108 @@ class Assembler(metaclass=Singleton):
 
     def translate_lines(self, lines):
         lines_out = []
+        c_command_map = self.c_command_map
 
         for line in lines:
 
-            line = self.delete_variable(line)
-
             if line[0] == '@':
                 # A-instruction
 
-                num = int(line[1:])
-                bin_num = bin(num)[2:]
-                zeros = '0' * (self.COMMAND_LEN - len(bin_num))
-                line = zeros + bin_num
+                line = self.delete_variable(line)
+                line = format(int(line[1:]), self.a_command_format)
 
             else:
                 # C-instruction
 
-                dest_str = ''
-                comp_str = line
-                jump_str = ''
-
-                jumping = re.search(';', line)
-                if jumping is not None:
-                    jump_str = line[jumping.end():]
-                    comp_str = comp_str[:jumping.start()]
-
-                assignment = re.search('=', line)
-                if assignment is not None:
-                    dest_str = line[:assignment.start()]
-                    comp_str = comp_str[assignment.end():]
-
-                line = '111'
-                line += self.comp_map[comp_str]
-                line += self.dest_map[dest_str]
-                line += self.jump_map[jump_str]
+                line = c_command_map[line]
 
             lines_out.append(line)
 
         return lines_out
 
-    def translate_file(self, file_in_name):
+    def translate_file(self, file_in_name, output_format='hack', cache=None):
         dot_pos = re.search(r'\.', file_in_name).start()
-        file_out_name = file_in_name[:dot_pos] + '.hack'
 
-        file_in = open(file_in_name)
-        file_out = open(file_out_name, 'w')
+        self.reset()
+        if cache is None:
+            file_in = open(file_in_name)
+            with Instrumentation.phase('assembler.labels', file_in_name) as phase:
+                lines = self.delete_comments_and_labels(Instrumentation.counted(file_in, phase, 'lines'))
+            with Instrumentation.phase('assembler.encode', file_in_name) as phase:
+                lines = self.translate_lines(lines)
+            if Instrumentation.enabled:
+                phase.counts['instructions'] = len(lines)
+        else:
+            file_in = open(file_in_name, 'rb')
+            with Instrumentation.phase('assembler.cache', file_in_name) as phase:
+                lines = cache.translate(self, file_in.read())
+            if Instrumentation.enabled:
+                phase.counts['instructions'] = len(lines)
+        file_in.close()
 
-        lines = file_in.readlines()
-        lines = self.delete_comments_and_labels(lines)
-        lines = self.translate_lines(lines)
+        with Instrumentation.phase('assembler.write', file_in_name) as phase:
+            if output_format == 'hack':
+                file_out = open(file_in_name[:dot_pos] + '.hack', 'w')
+                file_out.writelines(line + '\n' for line in lines)
+                file_out.close()
+            elif output_format in RomImage.BYTE_ORDERS:
+                RomImage.write(file_in_name[:dot_pos] + '.bin', (int(line, 2) for line in lines),
+                               RomImage.BYTE_ORDERS[output_format])
+            else:
+                raise ValueError
+        if Instrumentation.enabled:
+            phase.counts['instructions'] = len(lines)
 
-        for line in lines:
-            file_out.write(line + '\n')
+    @staticmethod
+    def translate_files(file_in_names, output_format='hack', jobs=None, cache_dir=None):
+        # every file gets its own Assembler, so nothing leaks between them
+        cache = None if cache_dir is None else AssemblerCache(cache_dir)
 
-        file_in.close()
-        file_out.close()
+        if jobs == 1 or len(file_in_names) < 2:
+            for file_in_name in file_in_names:
+                Assembler().translate_file(file_in_name, output_format, cache)
+            return cache
+
+        files_num = len(file_in_names)
+        with ProcessPoolExecutor(jobs) as executor:
+            for stats in executor.map(_translate_file, file_in_names,
+                                      [output_format] * files_num, [cache_dir] * files_num):
+                if cache is not None:
+                    cache.merge_stats(stats)
+
+        return cache
+
+
+Assembler.c_command_map = Assembler._build_c_command_map()
+
+
+def _translate_file(file_in_name, output_format, cache_dir):
+    if cache_dir is None:
+        Assembler().translate_file(file_in_name, output_format)
+        return None
+
+    cache = AssemblerCache(cache_dir)
+    Assembler().translate_file(file_in_name, output_format, cache)
+    return cache.stats
 
 
 if __name__ == '__main__':
-    for arg in sys.argv[1:]:
-        Assembler().translate_file(arg)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('files', nargs='+')
+    parser.add_argument('--format', choices=['hack', *RomImage.BYTE_ORDERS], default='hack',
+                        help='hack text, or a packed little/big-endian uint16 ROM image (.bin)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help='number of worker processes for several files')
+    parser.add_argument('--cache', metavar='DIR',
+                        help='reuse symbol tables and encoded words of unchanged files and regions')
+    parser.add_argument('--instrument', metavar='FILE',
+                        help='write per-phase times and counts as JSON, phases in worker processes not included')
+    parser.add_argument('--profile', metavar='FILE', help='dump cProfile stats of the run')
+    args = parser.parse_args()
+
+    def assemble():
+        cache = Assembler.translate_files(args.files, args.format, args.jobs, args.cache)
+        if cache is not None:
+            print(cache.summary())
+
+    Instrumentation.run(assemble, args.instrument, args.profile)
@@ -0,0 +1,36 @@
+import sys
+import os
+import time
+
+from assembler import Assembler
+
+
+def benchmark(file_in_name, repeat=5):
+    file_in = open(file_in_name)
+    source = file_in.readlines()
+    file_in.close()
+
+    best = None
+    for _ in range(repeat):
+        # one assembler for both passes, the labels the first finds are
+        # what the second resolves
+        assembler = Assembler()
+        start = time.perf_counter()
+        lines = assembler.delete_comments_and_labels(source)
+        assembler.translate_lines(lines)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return len(source), best
+
+
+if __name__ == '__main__':
+    files = sys.argv[1:]
+    if len(files) == 0:
+        files = [os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pong', 'Pong.asm')]
+
+    for file in files:
+        lines_num, seconds = benchmark(file)
+        print(f'{os.path.basename(file)}: {lines_num} lines in {seconds * 1000:.1f} ms, '
+              f'{lines_num / seconds:,.0f} lines/s')
@@ -0,0 +1,185 @@
+import os
+import re
+import json
+import time
+import hashlib
+
+
+class AssemblerCache:
+    VERSION = 2
+    REGION_MIN = 256
+    REGION_MAX = 4096
+
+    def __init__(self, cache_dir):
+        self._files_dir = os.path.join(cache_dir, 'files')
+        self._regions_dir = os.path.join(cache_dir, 'regions')
+        os.makedirs(self._files_dir, exist_ok=True)
+        os.makedirs(self._regions_dir, exist_ok=True)
+
+        self.stats = {
+            'file_hits': 0,
+            'file_misses': 0,
+            'region_hits': 0,
+            'region_misses': 0,
+            'seconds_saved': 0.0
+        }
+
+    def _hash(self, data):
+        return hashlib.sha256(f'{self.VERSION}\0'.encode() + data).hexdigest()
+
+    def _load(self, directory, key):
+        try:
+            entry_file = open(os.path.join(directory, key + '.json'))
+        except FileNotFoundError:
+            return None
+
+        try:
+            return json.load(entry_file)
+        except ValueError:
+            return None
+        finally:
+            entry_file.close()
+
+    def _store(self, directory, key, entry):
+        path = os.path.join(directory, key + '.json')
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+
+        entry_file = open(tmp_path, 'w')
+        entry_file.write(json.dumps(entry))
+        entry_file.close()
+
+        # concurrent writers of one key produce the same content
+        os.replace(tmp_path, path)
+
+    _label_start = re.compile(rb'^[ \t]*\(', re.MULTILINE)
+
+    def _split(self, source):
+        # regions start at a label once they are REGION_MIN lines long, so
+        # an edit moves no boundary but its own region's and every other
+        # region keeps its text and its key; code without labels is cut
+        # every REGION_MAX lines
+        regions = []
+        region_start = 0
+        for match in self._label_start.finditer(source):
+            if source.count(b'\n', region_start, match.start()) >= self.REGION_MIN:
+                regions.append(source[region_start:match.start()])
+                region_start = match.start()
+        regions.append(source[region_start:])
+
+        split_regions = []
+        for region in regions:
+            while region.count(b'\n') > self.REGION_MAX:
+                cut = 0
+                for _ in range(self.REGION_MAX):
+                    cut = region.index(b'\n', cut) + 1
+                split_regions.append(region[:cut])
+                region = region[cut:]
+            split_regions.append(region)
+        return split_regions
+
+    @staticmethod
+    def _parse_region(assembler, region):
+        # the encoded words with 0 in place of each symbol, the symbols
+        # with their positions, and the labels with their offsets; symbols
+        # are resolved when the file is linked
+        labels = []
+        symbols = []
+        words = []
+        c_command_map = assembler.c_command_map
+        a_command_format = assembler.a_command_format
+        for line in assembler.delete_comments(region.decode().splitlines()):
+            if line[0] == '(' and line[-1] == ')':
+                labels.append((line[1:-1].strip(), len(words)))
+            elif line[0] == '@':
+                if line[1:].isdecimal():
+                    words.append(format(int(line[1:]), a_command_format))
+                else:
+                    symbols.append((len(words), line[1:]))
+                    words.append(None)
+            else:
+                words.append(c_command_map[line])
+        return {'labels': labels, 'symbols': symbols, 'words': words}
+
+    def _translate_region(self, assembler, region):
+        # regions are keyed by their source text, before any address is known
+        key = self._hash(region)
+
+        entry = self._load(self._regions_dir, key)
+        if entry is not None:
+            self.stats['region_hits'] += 1
+            return entry
+
+        self.stats['region_misses'] += 1
+        start = time.perf_counter()
+        entry = self._parse_region(assembler, region)
+        entry['seconds'] = time.perf_counter() - start
+        self._store(self._regions_dir, key, entry)
+        return entry
+
+    @staticmethod
+    def _link(assembler, entries):
+        # label addresses from the regions' offsets, then variables in the
+        # order they first appear, as translate_lines allocates them
+        names_map = assembler.names_map
+        address = 0
+        for entry in entries:
+            for name, offset in entry['labels']:
+                names_map[name] = address + offset
+            address += len(entry['words'])
+
+        a_command_format = assembler.a_command_format
+        # a few symbols, such as SP, make up most references
+        encoded = {}
+        words = []
+        for entry in entries:
+            address = len(words)
+            words.extend(entry['words'])
+            for offset, var in entry['symbols']:
+                word = encoded.get(var)
+                if word is None:
+                    if var not in names_map:
+                        names_map[var] = assembler.NEXT_VAR_ADDRESS
+                        assembler.NEXT_VAR_ADDRESS += 1
+                    word = encoded[var] = format(names_map[var], a_command_format)
+                words[address + offset] = word
+        return words
+
+    def translate(self, assembler, source):
+        # seconds_saved is net: what assembling without the cache would have
+        # taken, from the stored times, less what this call took
+        start = time.perf_counter()
+        key = self._hash(source)
+
+        entry = self._load(self._files_dir, key)
+        if entry is not None:
+            self.stats['file_hits'] += 1
+            assembler.names_map = entry['names']
+            assembler.NEXT_VAR_ADDRESS = entry['next_var_address']
+            self.stats['seconds_saved'] += entry['seconds'] - (time.perf_counter() - start)
+            return entry['words']
+
+        self.stats['file_misses'] += 1
+        entries = [self._translate_region(assembler, region) for region in self._split(source)]
+        link_start = time.perf_counter()
+        words = self._link(assembler, entries)
+        link_seconds = time.perf_counter() - link_start
+
+        # without the cache: every region parsed, then linked
+        seconds = sum(entry['seconds'] for entry in entries) + link_seconds
+        self._store(self._files_dir, key, {
+            'seconds': seconds,
+            'names': assembler.names_map,
+            'next_var_address': assembler.NEXT_VAR_ADDRESS,
+            'words': words
+        })
+        self.stats['seconds_saved'] += seconds - (time.perf_counter() - start)
+        return words
+
+    def merge_stats(self, stats):
+        for name, value in stats.items():
+            self.stats[name] += value
+
+    def summary(self):
+        return (f'files: {self.stats["file_hits"]} hits, {self.stats["file_misses"]} misses; '
+                f'regions: {self.stats["region_hits"]} hits, {self.stats["region_misses"]} misses; '
+                f'{self.stats["seconds_saved"] * 1000:.1f} ms saved net')
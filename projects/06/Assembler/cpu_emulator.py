@@ -0,0 +1,202 @@
+import sys
+import argparse
+
+from assembler import Assembler
+from rom_image import RomImage
+
+
+class CPUEmulator:
+    ROM_SIZE = 32768
+    RAM_SIZE = 65536
+    WORD_MASK = 0xFFFF
+
+    # computations of the Hack instruction set keyed by their zx nx zy ny f no
+    # bits; x is D, y is A or M; any other bit pattern goes through _alu
+    comp_functions = {
+        0b101010: lambda x, y: 0,
+        0b111111: lambda x, y: 1,
+        0b111010: lambda x, y: 0xFFFF,
+        0b001100: lambda x, y: x,
+        0b110000: lambda x, y: y,
+        0b001101: lambda x, y: x ^ 0xFFFF,
+        0b110001: lambda x, y: y ^ 0xFFFF,
+        0b001111: lambda x, y: -x & 0xFFFF,
+        0b110011: lambda x, y: -y & 0xFFFF,
+        0b011111: lambda x, y: (x + 1) & 0xFFFF,
+        0b110111: lambda x, y: (y + 1) & 0xFFFF,
+        0b001110: lambda x, y: (x - 1) & 0xFFFF,
+        0b110010: lambda x, y: (y - 1) & 0xFFFF,
+        0b000010: lambda x, y: (x + y) & 0xFFFF,
+        0b010011: lambda x, y: (x - y) & 0xFFFF,
+        0b000111: lambda x, y: (y - x) & 0xFFFF,
+        0b000000: lambda x, y: x & y,
+        0b010101: lambda x, y: x | y
+    }
+
+    def __init__(self, words=()):
+        self.ram = [0] * self.RAM_SIZE
+        self.pc = 0
+        self.a = 0
+        self.d = 0
+        self.cycles = 0
+
+        # decoded ROM, one entry per field, indexed by address
+        self._is_c = []
+        self._a_values = []
+        self._a_bits = []
+        self._comps = []
+        self._dests = []
+        self._jumps = []
+        self._comp_functions = []
+
+        self.load_words(words)
+
+    @staticmethod
+    def _alu(comp, x, y):
+        if comp & 0b100000:
+            x = 0
+        if comp & 0b010000:
+            x ^= 0xFFFF
+        if comp & 0b001000:
+            y = 0
+        if comp & 0b000100:
+            y ^= 0xFFFF
+        out = (x + y) & 0xFFFF if comp & 0b000010 else x & y
+        if comp & 0b000001:
+            out ^= 0xFFFF
+        return out
+
+    def _comp_function(self, comp):
+        function = self.comp_functions.get(comp)
+        if function is None:
+            function = lambda x, y: self._alu(comp, x, y)
+        return function
+
+    def load_words(self, words):
+        words = list(words)
+        if len(words) > self.ROM_SIZE:
+            raise ValueError(f'program of {len(words)} words does not fit into ROM')
+
+        self._is_c = [word >> 15 for word in words]
+        self._a_values = [word & 0x7FFF for word in words]
+        self._a_bits = [(word >> 12) & 1 for word in words]
+        self._comps = [(word >> 6) & 0x3F for word in words]
+        self._dests = [(word >> 3) & 7 for word in words]
+        self._jumps = [word & 7 for word in words]
+        self._comp_functions = [self._comp_function(comp) for comp in self._comps]
+        self.reset()
+
+    def load(self, file_name):
+        if file_name.endswith('.asm'):
+            assembler = Assembler()
+            file_in = open(file_name)
+            lines = assembler.translate_lines(assembler.delete_comments_and_labels(file_in))
+            file_in.close()
+            self.load_words(int(line, 2) for line in lines)
+        elif file_name.endswith('.hack'):
+            file_in = open(file_name)
+            self.load_words(int(line, 2) for line in file_in if line.strip() != '')
+            file_in.close()
+        elif file_name.endswith('.bin'):
+            with RomImage(file_name) as rom:
+                self.load_words(rom.words)
+        else:
+            raise ValueError
+
+    def reset(self):
+        self.pc = 0
+        self.cycles = 0
+
+    def peek(self, address):
+        value = self.ram[address]
+        return value - 0x10000 if value & 0x8000 else value
+
+    def poke(self, address, value):
+        self.ram[address] = value & self.WORD_MASK
+
+    def run(self, max_cycles):
+        # locals only: attribute lookups dominate a loop this small
+        is_c = self._is_c
+        a_values = self._a_values
+        a_bits = self._a_bits
+        dests = self._dests
+        jumps = self._jumps
+        comp_functions = self._comp_functions
+        ram = self.ram
+        program_len = len(is_c)
+
+        pc = self.pc
+        a = self.a
+        d = self.d
+        cycles = 0
+
+        while cycles < max_cycles and pc < program_len:
+            cycles += 1
+
+            if not is_c[pc]:
+                a = a_values[pc]
+                pc += 1
+                continue
+
+            out = comp_functions[pc](d, ram[a] if a_bits[pc] else a)
+
+            jump = jumps[pc]
+            target = a
+
+            # dest bits are d1 = A, d2 = D, d3 = M
+            dest = dests[pc]
+            if dest:
+                if dest & 1:
+                    ram[a] = out
+                if dest & 2:
+                    d = out
+                if dest & 4:
+                    a = out
+
+            # jump bits are j1 = out < 0, j2 = out == 0, j3 = out > 0
+            if jump:
+                if out == 0:
+                    taken = jump & 2
+                elif out & 0x8000:
+                    taken = jump & 4
+                else:
+                    taken = jump & 1
+                if taken:
+                    pc = target
+                    continue
+
+            pc += 1
+
+        self.pc = pc
+        self.a = a
+        self.d = d
+        self.cycles += cycles
+        return cycles
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('file', help='.asm, .hack or .bin program, or a .tst script to run headless')
+    parser.add_argument('--cycles', type=int, default=1000000,
+                        help='cycles to run a program for, or a script\'s repeat with no count')
+    parser.add_argument('--dump', type=int, default=16, help='number of RAM words to print after the run')
+    parser.add_argument('--jit', action='store_true', help='compile basic blocks to Python functions')
+    args = parser.parse_args()
+
+    if args.jit:
+        from cpu_emulator_jit import CPUEmulatorJIT
+
+        emulator = CPUEmulatorJIT()
+    else:
+        emulator = CPUEmulator()
+
+    if args.file.endswith('.tst'):
+        from cpu_emulator_script import CPUEmulatorScript
+
+        sys.exit(0 if CPUEmulatorScript(args.file, emulator, args.cycles).run() else 1)
+
+    emulator.load(args.file)
+    emulator.run(args.cycles)
+    print(f'{emulator.cycles} cycles, PC={emulator.pc}')
+    for i in range(args.dump):
+        print(f'RAM[{i}] = {emulator.peek(i)}')
@@ -0,0 +1,168 @@
+from cpu_emulator import CPUEmulator
+
+
+class CPUEmulatorJIT(CPUEmulator):
+    MAX_BLOCK_LEN = 256
+
+    # same keys as CPUEmulator.comp_functions, as Python source
+    comp_sources = {
+        0b101010: '0',
+        0b111111: '1',
+        0b111010: '0xFFFF',
+        0b001100: '{x}',
+        0b110000: '{y}',
+        0b001101: '{x} ^ 0xFFFF',
+        0b110001: '{y} ^ 0xFFFF',
+        0b001111: '-{x} & 0xFFFF',
+        0b110011: '-{y} & 0xFFFF',
+        0b011111: '({x} + 1) & 0xFFFF',
+        0b110111: '({y} + 1) & 0xFFFF',
+        0b001110: '({x} - 1) & 0xFFFF',
+        0b110010: '({y} - 1) & 0xFFFF',
+        0b000010: '({x} + {y}) & 0xFFFF',
+        0b010011: '({x} - {y}) & 0xFFFF',
+        0b000111: '({y} - {x}) & 0xFFFF',
+        0b000000: '{x} & {y}',
+        0b010101: '{x} | {y}'
+    }
+
+    jump_sources = {
+        0b001: '0 < out < 0x8000',
+        0b010: 'out == 0',
+        0b011: 'out < 0x8000',
+        0b100: 'out >= 0x8000',
+        0b101: 'out != 0',
+        0b110: 'out == 0 or out >= 0x8000',
+        0b111: 'True'
+    }
+
+    def __init__(self, words=()):
+        self._blocks = []
+        super().__init__(words)
+
+    def load_words(self, words):
+        super().load_words(words)
+        # compiled blocks, indexed by their entry address
+        self._blocks = [None] * len(self._is_c)
+
+    def _comp_source(self, comp, y):
+        source = self.comp_sources.get(comp)
+        if source is None:
+            return f'alu({comp}, d, {y})'
+        return source.format(x='d', y=y)
+
+    def _compile_block(self, start):
+        # a block is a trace: it runs from start through conditional jumps,
+        # which become early returns, and follows unconditional jumps to
+        # a known address until it would revisit an address. A is tracked
+        # as a constant while it is known, so '@X' then M becomes ram[X]
+        lines = []
+        a_const = None
+        visited = set()
+        pc = start
+        block_len = 0
+        program_len = len(self._is_c)
+
+        while True:
+            if pc >= program_len or pc in visited or block_len == self.MAX_BLOCK_LEN:
+                a_exit = 'a' if a_const is None else str(a_const)
+                lines.append(f'return {pc}, {a_exit}, d, {block_len}')
+                break
+
+            visited.add(pc)
+            block_len += 1
+
+            if not self._is_c[pc]:
+                a_const = self._a_values[pc]
+                pc += 1
+                continue
+
+            a = 'a' if a_const is None else str(a_const)
+            m = f'ram[{a}]'
+            out = self._comp_source(self._comps[pc], m if self._a_bits[pc] else a)
+            dest = self._dests[pc]
+            jump = self._jumps[pc]
+
+            # chained assignment stores left to right, so M is written
+            # through the old A before A itself changes
+            targets = []
+            if dest & 1:
+                targets.append(m)
+            if dest & 2:
+                targets.append('d')
+
+            target_const = a_const
+            if jump and a_const is None:
+                lines.append('target = a')
+
+            if dest & 4:
+                targets.append('a')
+                a_const = None
+
+            conditional = jump not in {0, 0b111}
+            if conditional:
+                targets.append('out')
+
+            if targets == ['out'] and out in {'d', 'a', '0'}:
+                # 'D;JNE' and the like test the register itself
+                jump_source = self.jump_sources[jump].replace('out', out)
+            else:
+                jump_source = self.jump_sources.get(jump)
+                if targets:
+                    lines.append(' = '.join(targets) + f' = {out}')
+
+            if jump == 0:
+                pc += 1
+                continue
+
+            a_exit = 'a' if a_const is None else str(a_const)
+            a_target = 'target' if target_const is None else str(target_const)
+
+            if conditional:
+                lines.append(f'if {jump_source}:')
+                lines.append(f'    return {a_target}, {a_exit}, d, {block_len}')
+                pc += 1
+            elif target_const is not None:
+                pc = target_const
+            else:
+                lines.append(f'return target, {a_exit}, d, {block_len}')
+                break
+
+        source = f'def block_{start}(ram, a, d):\n' + ''.join(f'    {line}\n' for line in lines)
+        namespace = {'alu': self._alu}
+        exec(compile(source, f'<hack block {start}>', 'exec'), namespace)
+
+        block = namespace[f'block_{start}']
+        self._blocks[start] = block
+        return block
+
+    def run(self, max_cycles):
+        blocks = self._blocks
+        ram = self.ram
+        program_len = len(self._is_c)
+        max_block_len = self.MAX_BLOCK_LEN
+
+        pc = self.pc
+        a = self.a
+        d = self.d
+        cycles = 0
+
+        while pc < program_len:
+            if cycles + max_block_len > max_cycles:
+                # finish the budget exactly, one instruction at a time
+                self.pc, self.a, self.d = pc, a, d
+                self.cycles += cycles
+                return cycles + super().run(max_cycles - cycles)
+
+            block = blocks[pc]
+            if block is None:
+                block = self._compile_block(pc)
+
+            pc, a, d, block_len = block(ram, a, d)
+            cycles += block_len
+
+        self.pc = pc
+        self.a = a
+        self.d = d
+        self.cycles += cycles
+        return cycles
@@ -0,0 +1,206 @@
+import os
+import re
+
+from cpu_emulator import CPUEmulator
+
+
+class CPUEmulatorScript:
+    token_re = re.compile(r'"[^"]*"|[{},;]|[^\s{},;]+')
+    output_re = re.compile(r'(\w+)(?:\[(\d+)])?%([BDXS])(\d+)\.(\d+)\.(\d+)')
+
+    def __init__(self, file_in, emulator=None, max_cycles=1000000):
+        self._file_in = file_in
+        # how long a repeat with no count, which runs forever, is run
+        self._max_cycles = max_cycles
+        self._dir = os.path.dirname(os.path.abspath(file_in))
+        self._emulator = CPUEmulator() if emulator is None else emulator
+        self._output_list = []
+        self._output = None
+        self._compare = None
+        self._compare_line = 0
+        self._failed = False
+
+    def _tokenize(self):
+        script_file = open(self._file_in)
+        text = script_file.read()
+        script_file.close()
+
+        text = re.sub(r'/\*.*?\*/', ' ', text, flags=re.DOTALL)
+        text = re.sub(r'//[^\n]*', ' ', text)
+        return self.token_re.findall(text)
+
+    def _parse(self, tokens, pos=0):
+        # returns a list of commands, a repeat block is ('repeat', n, commands)
+        # with n None for a block repeated forever
+        commands = []
+        command = []
+
+        while pos < len(tokens):
+            token = tokens[pos]
+            pos += 1
+
+            if token in {',', ';'}:
+                if command:
+                    commands.append(command)
+                command = []
+            elif token == '{':
+                body, pos = self._parse(tokens, pos)
+                commands.append(('repeat', int(command[1]) if len(command) > 1 else None, body))
+                command = []
+            elif token == '}':
+                if command:
+                    commands.append(command)
+                return commands, pos
+            else:
+                command.append(token)
+
+        if command:
+            commands.append(command)
+        return commands, pos
+
+    def _value(self, name, index):
+        emulator = self._emulator
+        if name == 'RAM':
+            return emulator.peek(index)
+        if name == 'PC':
+            return emulator.pc
+        if name == 'A':
+            return emulator.a - 0x10000 if emulator.a & 0x8000 else emulator.a
+        if name == 'D':
+            return emulator.d - 0x10000 if emulator.d & 0x8000 else emulator.d
+        if name == 'time':
+            return emulator.cycles
+        raise ValueError(f'unknown variable {name}')
+
+    def _format(self, value, fmt, width):
+        if fmt == 'D':
+            return str(value)
+        if fmt == 'X':
+            return format(value & 0xFFFF, '04X')
+        if fmt == 'B':
+            return format(value & 0xFFFF, '016b')
+        return str(value)
+
+    def _write_output(self, line):
+        self._output.write(line + '\n')
+
+        if self._compare is not None:
+            expected = self._compare.readline().rstrip('\n')
+            self._compare_line += 1
+            if expected != line and not self._failed:
+                self._failed = True
+                print(f'Comparison failure at line {self._compare_line}')
+                print(f'  expected: {expected}')
+                print(f'  actual:   {line}')
+
+    def _output_header(self):
+        cells = []
+        for name, index, fmt, left, width, right in self._output_list:
+            title = name if index is None else f'{name}[{index}]'
+            total = left + width + right
+            cells.append(title[:total].center(total))
+        self._write_output('|' + '|'.join(cells) + '|')
+
+    def _output_values(self):
+        cells = []
+        for name, index, fmt, left, width, right in self._output_list:
+            value = self._format(self._value(name, index), fmt, width)
+            cells.append(' ' * left + value[-width:].rjust(width) + ' ' * right)
+        self._write_output('|' + '|'.join(cells) + '|')
+
+    def _find(self, file_name):
+        path = os.path.join(self._dir, file_name)
+        if os.path.exists(path):
+            return path
+
+        # fall back to the .asm source when the .hack was never built,
+        # ignoring case as the course's Windows tools do
+        stem = os.path.splitext(file_name)[0].lower()
+        for candidate in (stem + '.hack', stem + '.asm'):
+            for file in os.listdir(self._dir):
+                if file.lower() == candidate:
+                    return os.path.join(self._dir, file)
+        return path
+
+    def _set(self, target, value):
+        value = int(value)
+        match = re.fullmatch(r'(\w+)(?:\[(\d+)])?', target)
+        name, index = match.group(1), match.group(2)
+
+        if name == 'RAM':
+            self._emulator.poke(int(index), value)
+        elif name == 'PC':
+            self._emulator.pc = value
+        elif name == 'A':
+            self._emulator.a = value & 0xFFFF
+        elif name == 'D':
+            self._emulator.d = value & 0xFFFF
+        else:
+            raise ValueError(f'unknown variable {name}')
+
+    def _execute(self, commands):
+        for command in commands:
+            if command[0] == 'repeat':
+                _, times, body = command
+                if times is None:
+                    self._execute_forever(body)
+                elif all(inner == ['ticktock'] for inner in body):
+                    # a plain run of cycles goes straight to the inner loop
+                    self._emulator.run(times * len(body))
+                else:
+                    for _ in range(times):
+                        self._execute(body)
+                continue
+
+            name, args = command[0], command[1:]
+            if name == 'load':
+                self._emulator.load(self._find(args[0]))
+            elif name == 'output-file':
+                self._output = open(os.path.join(self._dir, args[0]), 'w')
+            elif name == 'compare-to':
+                self._compare = open(os.path.join(self._dir, args[0]))
+            elif name == 'output-list':
+                self._output_list = []
+                for arg in args:
+                    name, index, fmt, left, width, right = self.output_re.fullmatch(arg).groups()
+                    index = None if index is None else int(index)
+                    self._output_list.append((name, index, fmt, int(left), int(width), int(right)))
+                self._output_header()
+            elif name == 'output':
+                self._output_values()
+            elif name == 'set':
+                self._set(args[0], args[1])
+            elif name in {'tick', 'tock', 'ticktock'}:
+                if name != 'tick':
+                    self._emulator.run(1)
+            elif name == 'echo':
+                print(' '.join(args).strip('"'))
+            else:
+                raise ValueError(f'unsupported script command {name}')
+
+    def _execute_forever(self, body):
+        # until the program halts, running off the end of ROM, or
+        # max_cycles have run; a pass that runs no cycles stops it too
+        if all(inner == ['ticktock'] for inner in body):
+            self._emulator.run(self._max_cycles)
+            return
+        start = self._emulator.cycles
+        while self._emulator.cycles - start < self._max_cycles:
+            cycles = self._emulator.cycles
+            self._execute(body)
+            if self._emulator.cycles == cycles:
+                break
+
+    def run(self):
+        commands, _ = self._parse(self._tokenize())
+        try:
+            self._execute(commands)
+        finally:
+            if self._output is not None:
+                self._output.close()
+            if self._compare is not None:
+                self._compare.close()
+
+        if not self._failed:
+            print('End of script - Comparison ended successfully')
+        return not self._failed
@@ -0,0 +1,57 @@
+import sys
+import mmap
+from array import array
+
+
+class RomImage:
+    BYTE_ORDERS = {'le': 'little', 'be': 'big'}
+
+    def __init__(self, file_name, byteorder=sys.byteorder):
+        self._file = open(file_name, 'rb')
+        self._mmap = None
+
+        size = self._file.seek(0, 2)
+        if size % 2 != 0:
+            self._file.close()
+            raise ValueError(f'{file_name}: odd image size {size}')
+
+        if size == 0:
+            self.words = memoryview(array('H'))
+        elif byteorder == sys.byteorder:
+            # zero-copy: words are read straight from the mapped pages
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.words = memoryview(self._mmap).cast('H')
+        else:
+            words = array('H')
+            self._file.seek(0)
+            words.frombytes(self._file.read())
+            words.byteswap()
+            self.words = memoryview(words)
+
+    def __len__(self):
+        return len(self.words)
+
+    def __getitem__(self, item):
+        return self.words[item]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.words.release()
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+    @staticmethod
+    def write(file_name, words, byteorder=sys.byteorder):
+        words = array('H', words)
+        if byteorder != sys.byteorder:
+            words.byteswap()
+
+        file_out = open(file_name, 'wb')
+        words.tofile(file_out)
+        file_out.close()
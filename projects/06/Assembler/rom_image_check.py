@@ -0,0 +1,53 @@
+import sys
+import os
+import glob
+import shutil
+import tempfile
+
+from assembler import Assembler
+from rom_image import RomImage
+
+
+def check(file_in_name):
+    # assembles a copy of the file to .hack and to .bin in both byte orders,
+    # and returns the problems found reading the images back
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        copy = os.path.join(tmp_dir, os.path.basename(file_in_name))
+        shutil.copy(file_in_name, copy)
+        stem = os.path.splitext(copy)[0]
+
+        Assembler().translate_file(copy, 'hack')
+        hack_file = open(stem + '.hack')
+        words = [int(line, 2) for line in hack_file]
+        hack_file.close()
+
+        problems = []
+        for output_format, byteorder in RomImage.BYTE_ORDERS.items():
+            Assembler().translate_file(copy, output_format)
+            with RomImage(stem + '.bin', byteorder) as image:
+                if len(image) != len(words):
+                    problems.append(f'{output_format}: {len(image)} words, .hack has {len(words)}')
+                    continue
+                for address, word in enumerate(words):
+                    if image[address] != word:
+                        problems.append(f'{output_format}: word {address} is {image[address]:016b}, '
+                                        f'.hack has {word:016b}')
+                        break
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    return len(words), problems
+
+
+if __name__ == '__main__':
+    files = sys.argv[1:]
+    if len(files) == 0:
+        files = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '*', '*.asm')))
+
+    failed = False
+    for file in files:
+        words_num, problems = check(file)
+        print(f'{os.path.basename(file)}: {words_num} words, ' + ('; '.join(problems) if problems else 'ok'))
+        failed = failed or bool(problems)
+    sys.exit(1 if failed else 0)
@@ -1,8 +0,0 @@
-class Singleton(type):
-    instance = None
-
-    def __call__(cls, *args, **kwargs):
-        if cls.instance is None:
-            cls.instance = super().__call__(*args, **kwargs)
-
-        return cls.instance
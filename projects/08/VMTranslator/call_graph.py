@@ -0,0 +1,64 @@
+import os
+
+
+class CallGraph:
+    ROOT = 'Sys.init'
+
+    def __init__(self):
+        # function name -> file name, number of VM commands, called functions
+        self.functions = {}
+        self.kept = set()
+        self.dropped = []
+
+    def add_file(self, file_in):
+        file_name = os.path.basename(file_in)
+        function_name = None
+
+        vm_file = open(file_in, 'r')
+        for line in vm_file:
+            comment = line.find('//')
+            if comment != -1:
+                line = line[:comment]
+            words = line.split()
+            if not words:
+                continue
+
+            if words[0] == 'function':
+                function_name = words[1]
+                self.functions[function_name] = [file_name, 0, set()]
+            if function_name is None:
+                continue
+            self.functions[function_name][1] += 1
+            if words[0] == 'call':
+                self.functions[function_name][2].add(words[1])
+        vm_file.close()
+
+    def reachable(self):
+        # functions reachable from Sys.init, or None to keep everything when
+        # there is no Sys.init to start from
+        if self.ROOT not in self.functions:
+            return None
+
+        self.kept = {self.ROOT}
+        stack = [self.ROOT]
+        while stack:
+            for callee in self.functions[stack.pop()][2]:
+                if callee in self.functions and callee not in self.kept:
+                    self.kept.add(callee)
+                    stack.append(callee)
+
+        self.dropped = sorted(name for name in self.functions if name not in self.kept)
+        return self.kept
+
+    def report(self):
+        commands = sum(function[1] for function in self.functions.values())
+        dropped_commands = sum(self.functions[name][1] for name in self.dropped)
+        lines = [f'dropped {len(self.dropped)} of {len(self.functions)} functions, '
+                 f'{dropped_commands} of {commands} VM commands']
+
+        by_file = {}
+        for name in self.dropped:
+            by_file.setdefault(self.functions[name][0], []).append(name)
+        for file_name in sorted(by_file):
+            lines.append(f'  {file_name}: ' + ', '.join(by_file[file_name]))
+        return lines
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# the modules the projects share live in projects/common; importing this
+# puts them on the path for this project's modules
+COMMON_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'common'))
+if COMMON_DIR not in sys.path:
+    sys.path.append(COMMON_DIR)
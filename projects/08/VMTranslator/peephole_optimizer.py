@@ -0,0 +1,189 @@
+class PeepholeOptimizer:
+    push = ['@SP', 'A=M', 'M=D', '@SP', 'M=M+1']
+    pop = ['@SP', 'M=M-1', 'A=M', 'D=M']
+    stack_top = ['@SP', 'A=M', 'A=A-1']
+
+    def __init__(self):
+        # ROM words, labels not counted
+        self.lines_in = 0
+        self.lines_out = 0
+
+        # instructions, and the comment lines written in front of each
+        self._code = []
+        self._comments = []
+        self._out = []
+        self._out_comments = []
+        self._pending_comments = []
+        self._trailing_comments = []
+
+    @staticmethod
+    def _is_comment(line):
+        return line.startswith('//')
+
+    @staticmethod
+    def _is_label(line):
+        return line.startswith('(')
+
+    @staticmethod
+    def _is_a_command(line):
+        return line.startswith('@')
+
+    @staticmethod
+    def _split(line):
+        # dest, comp, jump of a C-instruction
+        dest, _, comp = line.rpartition('=')
+        comp, _, jump = comp.partition(';')
+        return dest, comp, jump
+
+    def _match(self, pos, pattern):
+        # compared in place, a slice per position would copy the code
+        code = self._code
+        if pos + len(pattern) > len(code):
+            return False
+        for i, line in enumerate(pattern):
+            if code[pos + i] != line:
+                return False
+        return True
+
+    def _a_is_dead(self, pos):
+        # A set before pos is not read from pos on
+        return pos == len(self._code) or self._is_a_command(self._code[pos]) or self._is_label(self._code[pos])
+
+    def _d_is_dead(self, pos):
+        # scans forward by index, the rest of the code is not copied
+        code = self._code
+        for i in range(pos, len(code)):
+            line = code[i]
+            if self._is_label(line):
+                return False
+            if self._is_a_command(line):
+                continue
+            dest, comp, jump = self._split(line)
+            if 'D' in comp or jump != '':
+                return False
+            if 'D' in dest:
+                return True
+        return False
+
+    def _rom_size(self):
+        return sum(1 for line in self._code if not self._is_label(line))
+
+    def _emit(self, pos, length, replacement):
+        # replaces code[pos:pos + length], comments of the replaced lines
+        # move to the first instruction written after them
+        for i in range(pos, pos + length):
+            self._pending_comments += self._comments[i]
+
+        for line in replacement:
+            self._out.append(line)
+            self._out_comments.append(self._pending_comments)
+            self._pending_comments = []
+
+        return pos + length
+
+    def _start_pass(self):
+        self._out = []
+        self._out_comments = []
+        self._pending_comments = []
+
+    def _end_pass(self):
+        changed = self._out != self._code
+        self._code = self._out
+        self._comments = self._out_comments
+        self._trailing_comments = self._pending_comments + self._trailing_comments
+        return changed
+
+    def _rewrite_stack(self):
+        self._start_pass()
+        pos = 0
+
+        while pos < len(self._code):
+            # push D then pop into D
+            if self._match(pos, self.push + self.pop):
+                length = len(self.push) + len(self.pop)
+                pos = self._emit(pos, length, [] if self._a_is_dead(pos + length) else ['@SP', 'A=M'])
+
+            # push: bump SP first, then store through SP-1, which leaves
+            # A on the stack top for a following top access
+            elif self._match(pos, self.push) and self._a_is_dead(pos + len(self.push)):
+                length = len(self.push)
+                if self._match(pos + length, self.stack_top):
+                    length += len(self.stack_top)
+                pos = self._emit(pos, length, ['@SP', 'M=M+1', 'A=M-1', 'M=D'])
+
+            # pop: decrement SP and load it into A at once
+            elif self._match(pos, ['@SP', 'M=M-1', 'A=M']):
+                pos = self._emit(pos, 3, ['@SP', 'AM=M-1'])
+
+            elif self._match(pos, self.stack_top):
+                pos = self._emit(pos, 3, ['@SP', 'A=M-1'])
+
+            else:
+                pos = self._emit(pos, 1, [self._code[pos]])
+
+        return self._end_pass()
+
+    def _remove_reloads(self):
+        # drops '@X' while A already holds X, and '@X' that is overwritten
+        # by the next A-instruction before being used
+        self._start_pass()
+        a_value = None
+
+        for pos, line in enumerate(self._code):
+            if self._is_label(line):
+                a_value = None
+            elif self._is_a_command(line):
+                if line == a_value or pos + 1 < len(self._code) and self._is_a_command(self._code[pos + 1]):
+                    self._emit(pos, 1, [])
+                    continue
+                a_value = line
+            else:
+                dest, comp, jump = self._split(line)
+                if 'A' in dest or jump == 'JMP':
+                    a_value = None
+            self._emit(pos, 1, [line])
+
+        return self._end_pass()
+
+    def _remove_dead_loads(self):
+        # drops 'D=...' whose value is overwritten before it is read
+        self._start_pass()
+
+        for pos, line in enumerate(self._code):
+            if not self._is_label(line) and not self._is_a_command(line):
+                dest, comp, jump = self._split(line)
+                if dest == 'D' and jump == '' and self._d_is_dead(pos + 1):
+                    self._emit(pos, 1, [])
+                    continue
+            self._emit(pos, 1, [line])
+
+        return self._end_pass()
+
+    def optimize(self, lines):
+        self._code = []
+        self._comments = []
+
+        comments = []
+        for line in lines:
+            if self._is_comment(line):
+                comments.append(line)
+            else:
+                self._code.append(line)
+                self._comments.append(comments)
+                comments = []
+        self._trailing_comments = comments
+        self.lines_in += self._rom_size()
+
+        changed = True
+        while changed:
+            changed = self._rewrite_stack()
+            changed = self._remove_dead_loads() or changed
+            changed = self._remove_reloads() or changed
+
+        self.lines_out += self._rom_size()
+
+        out = []
+        for line, comments in zip(self._code, self._comments):
+            out += comments
+            out.append(line)
+        return out + self._trailing_comments
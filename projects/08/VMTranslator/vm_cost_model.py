@@ -0,0 +1,260 @@
+import os
+import json
+import argparse
+
+from vm_translator import VMTranslator
+from vm_translator_writer import VMTranslatorWriter
+
+
+class VMCostWriter(VMTranslatorWriter):
+    # a writer that keeps what it emits instead of writing it, so the code
+    # of each VM command can be taken and measured on its own
+
+    def __init__(self, compact=False):
+        super().__init__(None, compact)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        lines = ''.join(self._buffer).splitlines()
+        self._buffer = []
+        return lines
+
+
+def path_cycles(lines, start=0, external=None):
+    # (fewest, most) instructions run from instruction number start until
+    # control leaves lines: by a jump out of them, to a computed address or
+    # off their end. A jump to a label in external adds that label's cost.
+    # The writer only jumps forward within one command, so a backward jump
+    # counts as leaving
+    external = external or {}
+    instructions = []
+    labels = {}
+    for line in lines:
+        if line.startswith('//'):
+            continue
+        if line.startswith('('):
+            labels[line[1:-1]] = len(instructions)
+        else:
+            instructions.append(line)
+
+    costs = [(0, 0)] * (len(instructions) + 1)
+    for i in range(len(instructions) - 1, -1, -1):
+        fall = costs[i + 1]
+        dest_comp, _, jump = instructions[i].partition(';')
+        if not jump:
+            costs[i] = (fall[0] + 1, fall[1] + 1)
+            continue
+
+        previous = instructions[i - 1] if i > 0 else ''
+        target = previous[1:] if previous.startswith('@') else None
+        if target in labels and labels[target] > i:
+            taken = costs[labels[target]]
+        else:
+            taken = external.get(target, (0, 0))
+
+        if jump == 'JMP' and dest_comp == '0':
+            costs[i] = (taken[0] + 1, taken[1] + 1)
+        else:
+            costs[i] = (min(taken[0], fall[0]) + 1, max(taken[1], fall[1]) + 1)
+    return costs[start]
+
+
+def _rom_size(lines):
+    return sum(1 for line in lines if not line.startswith('(') and not line.startswith('//'))
+
+
+class VMCostModel:
+    # static ROM size and cycles of the translator's output, per function
+    # and per kind of VM command, measured on the code the writer emits for
+    # each command. Cycles are those of one run of a command; a function's
+    # are those of one pass through its body, loops and callees not counted.
+    # Peephole optimization is not accounted for
+    SHARED_ROUTINES = {'call': '$$CALL', 'return': '$$RETURN', 'JEQ': '$$CMP.JEQ', 'JLT': '$$CMP.JLT',
+                       'JGT': '$$CMP.JGT'}
+
+    def __init__(self, compact=False):
+        self._compact = compact
+        # function name -> file name, ROM words, fewest and most cycles, commands
+        self.functions = {}
+        # command kind -> count, ROM words, fewest and most cycles of one
+        self.kinds = {}
+
+        # compact mode: what the shared routines cost a command jumping to
+        # them, and which of them the program uses
+        self._external = {}
+        self._shared_used = set()
+        if compact:
+            writer = VMCostWriter(compact)
+            writer.shared_used = set(self.SHARED_ROUTINES)
+            writer.shared_routines()
+            lines = writer.take()
+            for label in self.SHARED_ROUTINES.values():
+                self._external[label] = path_cycles(lines, self._label_position(lines, label))
+
+    @staticmethod
+    def _label_position(lines, label):
+        instructions = 0
+        for line in lines:
+            if line == f'({label})':
+                return instructions
+            if not line.startswith('(') and not line.startswith('//'):
+                instructions += 1
+        raise ValueError(label)
+
+    @staticmethod
+    def command_kind(words):
+        # push and pop cost depends on the segment, call on nothing the
+        # VM says and function on its number of locals
+        if words[0] in ('push', 'pop'):
+            return f'{words[0]} {words[1]}'
+        if words[0] == 'call':
+            return f'call ({words[2]} args)'
+        if words[0] == 'function':
+            return f'function ({words[2]} locals)'
+        return words[0]
+
+    def _add(self, function_name, file_name, kind, lines):
+        rom = _rom_size(lines)
+        cycles = path_cycles(lines, external=self._external)
+
+        function = self.functions.setdefault(function_name, [file_name, 0, 0, 0, 0])
+        function[1] += rom
+        function[2] += cycles[0]
+        function[3] += cycles[1]
+        function[4] += 1
+
+        total = self.kinds.setdefault(kind, [0, 0, cycles[0], cycles[1]])
+        total[0] += 1
+        total[1] += rom
+        total[2] = min(total[2], cycles[0])
+        total[3] = max(total[3], cycles[1])
+
+    def add_file(self, file_in):
+        file_name = os.path.basename(file_in)
+        writer = VMCostWriter(self._compact)
+        writer.set_file_name(os.path.splitext(file_name)[0])
+        translator = VMTranslator()
+        function_name = f'({file_name})'
+
+        vm_file = open(file_in, 'r')
+        for line in vm_file:
+            comment = line.find('//')
+            if comment != -1:
+                line = line[:comment]
+            words = line.split()
+            if not words:
+                continue
+
+            if words[0] == 'function':
+                function_name = words[1]
+            translator.translate_command(' '.join(words), writer)
+            self._add(function_name, file_name, self.command_kind(words), writer.take())
+        vm_file.close()
+        self._shared_used |= writer.shared_used
+
+    def add_bootstrap(self):
+        if '(bootstrap)' in self.functions:
+            return
+        writer = VMCostWriter(self._compact)
+        writer.bootstrap()
+        self._add('(bootstrap)', '', 'bootstrap', writer.take())
+        self._shared_used |= writer.shared_used
+
+    def add(self, source):
+        files_in, _ = VMTranslator().explore_source(source)
+        if len(files_in) > 1:
+            self.add_bootstrap()
+        for file_in in files_in:
+            self.add_file(file_in)
+
+    def shared_rom_size(self):
+        # the routines written after the program, as the translator links them
+        writer = VMCostWriter(self._compact)
+        writer.shared_used = self._shared_used
+        writer.shared_routines()
+        return _rom_size(writer.take())
+
+    def rom_size(self):
+        return sum(function[1] for function in self.functions.values()) + self.shared_rom_size()
+
+    def report(self):
+        return {
+            'compact': self._compact,
+            'rom': self.rom_size(),
+            'shared_rom': self.shared_rom_size(),
+            'functions': {name: {'file': function[0], 'rom': function[1], 'cycles_min': function[2],
+                                 'cycles_max': function[3], 'commands': function[4]}
+                          for name, function in self.functions.items()},
+            'kinds': {kind: {'count': total[0], 'rom': total[1], 'rom_each': total[1] // total[0],
+                             'cycles_min': total[2], 'cycles_max': total[3]}
+                      for kind, total in self.kinds.items()}
+        }
+
+    @staticmethod
+    def _cycles(low, high):
+        return str(low) if low == high else f'{low}-{high}'
+
+    def summary(self, top=20):
+        # the largest functions and command kinds, by ROM words
+        lines = [f'{self.rom_size()} ROM words, {len(self.functions)} functions' +
+                 (f', {self.shared_rom_size()} in shared routines' if self._compact else '')]
+
+        lines.append('functions: ROM words, cycles of one pass, VM commands')
+        functions = sorted(self.functions.items(), key=lambda item: -item[1][1])
+        for name, function in functions[:top]:
+            lines.append(f'  {name}: {function[1]}, {self._cycles(function[2], function[3])}, {function[4]}')
+
+        lines.append('commands: count, ROM words in all, each, cycles of one run')
+        kinds = sorted(self.kinds.items(), key=lambda item: -item[1][1])
+        for kind, total in kinds[:top]:
+            lines.append(f'  {kind}: {total[0]}, {total[1]}, {total[1] // total[0]}, '
+                         f'{self._cycles(total[2], total[3])}')
+        return lines
+
+    @staticmethod
+    def compare(old_report, new_report, top=20):
+        # ROM growth between two reports, largest changes first
+        lines = [f'ROM words: {old_report["rom"]} -> {new_report["rom"]} '
+                 f'({new_report["rom"] - old_report["rom"]:+d})']
+        old_functions = old_report['functions']
+        new_functions = new_report['functions']
+        changes = []
+        for name in old_functions.keys() | new_functions.keys():
+            old_rom = old_functions[name]['rom'] if name in old_functions else 0
+            new_rom = new_functions[name]['rom'] if name in new_functions else 0
+            if old_rom != new_rom:
+                changes.append((name, old_rom, new_rom))
+        changes.sort(key=lambda change: (-abs(change[2] - change[1]), change[0]))
+        for name, old_rom, new_rom in changes[:top]:
+            lines.append(f'  {name}: {old_rom} -> {new_rom} ({new_rom - old_rom:+d})')
+        return lines
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='report the ROM size and cycles of the translated code, '
+                                                 'per function and per kind of VM command')
+    parser.add_argument('sources', nargs='+', help='.vm files or directories of them, measured as one program')
+    parser.add_argument('--compact', action='store_true', help='measure the code of the translator\'s --compact mode')
+    parser.add_argument('--top', type=int, default=20, help='number of functions and command kinds to list')
+    parser.add_argument('--json', metavar='FILE', help='write the whole report as JSON')
+    parser.add_argument('--compare', metavar='FILE', help='list ROM changes against an earlier --json report')
+    args = parser.parse_args()
+
+    model = VMCostModel(args.compact)
+    for arg in args.sources:
+        model.add(arg)
+    report = model.report()
+    print('\n'.join(model.summary(args.top)))
+
+    if args.compare is not None:
+        old_file = open(args.compare)
+        old_report = json.load(old_file)
+        old_file.close()
+        print('\n'.join(VMCostModel.compare(old_report, report, args.top)))
+
+    if args.json is not None:
+        output = open(args.json, 'w')
+        json.dump(report, output, indent=2)
+        output.close()
@@ -0,0 +1,381 @@
+import os
+import sys
+import argparse
+
+from vm_native_os import VMNativeOS
+
+
+class VMEmulator:
+    RAM_SIZE = 32768
+    STACK_BEGINNING = 256
+    STATIC_BEGINNING = 16
+
+    # opcodes, the most frequent first as the dispatch loop tests them in order
+    PUSH_CONSTANT = 0
+    PUSH_SEGMENT = 1
+    PUSH_RAM = 2
+    POP_SEGMENT = 3
+    POP_RAM = 4
+    ADD = 5
+    SUB = 6
+    IF_GOTO = 7
+    GOTO = 8
+    CALL = 9
+    FUNCTION = 10
+    RETURN = 11
+    EQ = 12
+    LT = 13
+    GT = 14
+    NOT = 15
+    NEG = 16
+    AND = 17
+    OR = 18
+    NATIVE_CALL = 19
+
+    segment_pointer = {'local': 1, 'argument': 2, 'this': 3, 'that': 4}
+    temp_beginning = 5
+    pointer_beginning = 3
+
+    arithmetic_ops = {'add': ADD, 'sub': SUB, 'neg': NEG, 'eq': EQ, 'gt': GT, 'lt': LT,
+                      'and': AND, 'or': OR, 'not': NOT}
+
+    def __init__(self, native_os=False):
+        self.ram = [0] * self.RAM_SIZE
+        self.pc = 0
+        self.steps = 0
+
+        # decoded program: opcode and two integer operands per command
+        self._ops = []
+        self._args1 = []
+        self._args2 = []
+        self.commands = []
+        self.functions = {}
+        self.static_addresses = {}
+
+        # natives[i] is a (Python function, address of its .vm code) pair
+        self._native_functions = VMNativeOS(self).functions() if native_os else {}
+        self._natives = []
+        self._program_functions = set()
+
+    def _explore_source(self, source):
+        if os.path.isfile(source):
+            if source.endswith('.vm'):
+                return [source]
+            raise ValueError
+        return [os.path.join(source, file) for file in sorted(os.listdir(source)) if file.endswith('.vm')]
+
+    def _read_commands(self, file_in, skip_functions):
+        # yields (function name, words) of the file's commands, leaving
+        # out the bodies of functions in skip_functions
+        vm_file = open(file_in)
+        skipping = False
+        for line in vm_file:
+            comment = line.find('//')
+            if comment != -1:
+                line = line[:comment]
+            words = line.split()
+            if not words:
+                continue
+            if words[0] == 'function':
+                skipping = words[1] in skip_functions
+            if not skipping:
+                yield words
+        vm_file.close()
+
+    def load(self, sources, os_sources=()):
+        # OS functions the program defines itself are left out
+        program = []
+        for source in sources:
+            for file_in in self._explore_source(source):
+                file_name = os.path.splitext(os.path.basename(file_in))[0]
+                program += [(file_name, words) for words in self._read_commands(file_in, ())]
+
+        self._program_functions = {words[1] for _, words in program if words[0] == 'function'}
+        for source in os_sources:
+            for file_in in self._explore_source(source):
+                file_name = os.path.splitext(os.path.basename(file_in))[0]
+                program += [(file_name, words) for words in self._read_commands(file_in, self._program_functions)]
+
+        self._decode(program)
+        self.reset()
+
+    def _static_address(self, file_name, index):
+        key = f'{file_name}.{index}'
+        if key not in self.static_addresses:
+            self.static_addresses[key] = self.STATIC_BEGINNING + len(self.static_addresses)
+        return self.static_addresses[key]
+
+    def _decode(self, program):
+        # first pass: addresses of functions and labels; labels take no
+        # step in the VM emulator, so they are not decoded and address the
+        # command after them
+        self.functions = {}
+        labels = {}
+        function_name = ''
+        pc = 0
+        for _, words in program:
+            if words[0] == 'label':
+                labels[f'{function_name}${words[1]}'] = pc
+                continue
+            if words[0] == 'function':
+                function_name = words[1]
+                self.functions[function_name] = pc
+            pc += 1
+
+        self._ops = []
+        self._args1 = []
+        self._args2 = []
+        self.commands = []
+        self.static_addresses = {}
+        self._natives = []
+        natives = {}
+        function_name = ''
+
+        for file_name, words in program:
+            command = words[0]
+            arg1 = 0
+            arg2 = 0
+
+            if command == 'push' or command == 'pop':
+                segment = words[1]
+                index = int(words[2])
+                if segment == 'constant':
+                    op = self.PUSH_CONSTANT
+                    arg1 = index
+                elif segment in self.segment_pointer:
+                    op = self.PUSH_SEGMENT
+                    arg1 = self.segment_pointer[segment]
+                    arg2 = index
+                else:
+                    op = self.PUSH_RAM
+                    if segment == 'static':
+                        arg1 = self._static_address(file_name, index)
+                    elif segment == 'temp':
+                        arg1 = self.temp_beginning + index
+                    elif segment == 'pointer':
+                        arg1 = self.pointer_beginning + index
+                    else:
+                        raise SyntaxError(f'unknown segment {segment}')
+                if command == 'pop':
+                    if op == self.PUSH_CONSTANT:
+                        raise SyntaxError('pop constant')
+                    op = self.POP_SEGMENT if op == self.PUSH_SEGMENT else self.POP_RAM
+            elif command in self.arithmetic_ops:
+                op = self.arithmetic_ops[command]
+            elif command == 'label':
+                continue
+            elif command == 'goto' or command == 'if-goto':
+                op = self.GOTO if command == 'goto' else self.IF_GOTO
+                arg1 = labels[f'{function_name}${words[1]}']
+            elif command == 'function':
+                function_name = words[1]
+                op = self.FUNCTION
+                arg1 = int(words[2])
+            elif command == 'call':
+                arg2 = int(words[2])
+                if words[1] in self._native_functions and words[1] not in self._program_functions:
+                    # OS functions the program does not define itself
+                    op = self.NATIVE_CALL
+                    if words[1] not in natives:
+                        natives[words[1]] = len(self._natives)
+                        self._natives.append((self._native_functions[words[1]], self.functions.get(words[1])))
+                    arg1 = natives[words[1]]
+                else:
+                    op = self.CALL
+                    arg1 = self._resolve_call(words[1])
+            elif command == 'return':
+                op = self.RETURN
+            else:
+                raise SyntaxError(f'unknown command {command}')
+
+            self._ops.append(op)
+            self._args1.append(arg1)
+            self._args2.append(arg2)
+            self.commands.append(' '.join(words))
+
+    def _resolve_call(self, function_name):
+        if function_name not in self.functions:
+            raise NameError(f'function {function_name} is not loaded')
+        return self.functions[function_name]
+
+    def reset(self):
+        # like the VM emulator, execution starts at Sys.init if there is one
+        self.pc = self.functions.get('Sys.init', 0)
+        self.steps = 0
+
+    def bootstrap(self):
+        # the frame the bootstrap code's 'call Sys.init' would leave, with
+        # a return address past the program end, where execution stops
+        ram = self.ram
+        ram[0] = self.STACK_BEGINNING
+        ram[ram[0]] = len(self._ops)
+        for i in range(1, 5):
+            ram[ram[0] + i] = ram[i]
+        ram[2] = ram[0]
+        ram[0] += 5
+        ram[1] = ram[0]
+        self.reset()
+
+    def peek(self, address):
+        return self.ram[address]
+
+    def poke(self, address, value):
+        self.ram[address] = ((value + 0x8000) & 0xFFFF) - 0x8000
+
+    def run(self, max_steps):
+        # SP lives in a local while running and is written back at the end
+        ops = self._ops
+        args1 = self._args1
+        args2 = self._args2
+        natives = self._natives
+        ram = self.ram
+        program_len = len(ops)
+
+        pc = self.pc
+        sp = ram[0]
+        steps = 0
+
+        while steps < max_steps and pc < program_len:
+            op = ops[pc]
+            steps += 1
+            pc += 1
+
+            if op == 0:  # PUSH_CONSTANT
+                ram[sp] = args1[pc - 1]
+                sp += 1
+            elif op == 1:  # PUSH_SEGMENT
+                ram[sp] = ram[ram[args1[pc - 1]] + args2[pc - 1]]
+                sp += 1
+            elif op == 2:  # PUSH_RAM
+                ram[sp] = ram[args1[pc - 1]]
+                sp += 1
+            elif op == 3:  # POP_SEGMENT
+                sp -= 1
+                ram[ram[args1[pc - 1]] + args2[pc - 1]] = ram[sp]
+            elif op == 4:  # POP_RAM
+                sp -= 1
+                ram[args1[pc - 1]] = ram[sp]
+            elif op == 5:  # ADD
+                sp -= 1
+                value = ram[sp - 1] + ram[sp]
+                if value > 32767:
+                    value -= 65536
+                elif value < -32768:
+                    value += 65536
+                ram[sp - 1] = value
+            elif op == 6:  # SUB
+                sp -= 1
+                value = ram[sp - 1] - ram[sp]
+                if value > 32767:
+                    value -= 65536
+                elif value < -32768:
+                    value += 65536
+                ram[sp - 1] = value
+            elif op == 7:  # IF_GOTO
+                sp -= 1
+                if ram[sp]:
+                    pc = args1[pc - 1]
+            elif op == 8:  # GOTO
+                pc = args1[pc - 1]
+            elif op == 9:  # CALL
+                ram[sp] = pc
+                ram[sp + 1] = ram[1]
+                ram[sp + 2] = ram[2]
+                ram[sp + 3] = ram[3]
+                ram[sp + 4] = ram[4]
+                ram[2] = sp - args2[pc - 1]
+                sp += 5
+                ram[1] = sp
+                pc = args1[pc - 1]
+            elif op == 10:  # FUNCTION
+                for _ in range(args1[pc - 1]):
+                    ram[sp] = 0
+                    sp += 1
+            elif op == 11:  # RETURN
+                frame = ram[1]
+                pc = ram[frame - 5]
+                arg = ram[2]
+                ram[arg] = ram[sp - 1]
+                sp = arg + 1
+                ram[4] = ram[frame - 1]
+                ram[3] = ram[frame - 2]
+                ram[2] = ram[frame - 3]
+                ram[1] = ram[frame - 4]
+            elif op == 19:  # NATIVE_CALL
+                function, address = natives[args1[pc - 1]]
+                n_args = args2[pc - 1]
+                ram[0] = sp
+                value = function(*ram[sp - n_args:sp])
+                if value is not None:
+                    sp -= n_args
+                    ram[sp] = value
+                    sp += 1
+                    continue
+                if address is None:
+                    self.pc = pc - 1
+                    ram[0] = sp
+                    raise RuntimeError(f'{self.commands[pc - 1]} failed and its .vm code is not loaded')
+
+                # the .vm code takes over where the native one gives up
+                ram[sp] = pc
+                ram[sp + 1] = ram[1]
+                ram[sp + 2] = ram[2]
+                ram[sp + 3] = ram[3]
+                ram[sp + 4] = ram[4]
+                ram[2] = sp - n_args
+                sp += 5
+                ram[1] = sp
+                pc = address
+            elif op == 12:  # EQ
+                sp -= 1
+                ram[sp - 1] = -1 if ram[sp - 1] == ram[sp] else 0
+            elif op == 13:  # LT
+                sp -= 1
+                ram[sp - 1] = -1 if ram[sp - 1] < ram[sp] else 0
+            elif op == 14:  # GT
+                sp -= 1
+                ram[sp - 1] = -1 if ram[sp - 1] > ram[sp] else 0
+            elif op == 15:  # NOT
+                ram[sp - 1] = ~ram[sp - 1]
+            elif op == 16:  # NEG
+                value = -ram[sp - 1]
+                ram[sp - 1] = -32768 if value == 32768 else value
+            elif op == 17:  # AND
+                sp -= 1
+                ram[sp - 1] &= ram[sp]
+            elif op == 18:  # OR
+                sp -= 1
+                ram[sp - 1] |= ram[sp]
+
+        ram[0] = sp
+        self.pc = pc
+        self.steps += steps
+        return steps
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('sources', nargs='+', help='.vm files or directories of them, or a VM emulator .tst script')
+    parser.add_argument('--os', action='append', default=[], metavar='DIR',
+                        help='.vm files of the OS, used for functions the program does not define')
+    parser.add_argument('--native', action='store_true', help='run OS functions as Python code')
+    parser.add_argument('--steps', type=int, default=10000000,
+                        help='steps to run a program for, or a script\'s repeat with no count')
+    parser.add_argument('--dump', type=int, default=16, help='number of RAM words to print after the run')
+    args = parser.parse_args()
+
+    emulator = VMEmulator(args.native)
+
+    if args.sources[0].endswith('.tst'):
+        from vm_emulator_script import VMEmulatorScript
+
+        script = VMEmulatorScript(args.sources[0], emulator, args.steps)
+        script.set_os(args.os)
+        sys.exit(0 if script.run() else 1)
+
+    emulator.load(args.sources, args.os)
+    emulator.bootstrap()
+    emulator.run(args.steps)
+    print(f'{emulator.steps} steps, PC={emulator.pc}')
+    for i in range(args.dump):
+        print(f'RAM[{i}] = {emulator.peek(i)}')
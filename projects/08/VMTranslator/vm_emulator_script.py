@@ -0,0 +1,186 @@
+import os
+import re
+
+from vm_emulator import VMEmulator
+
+
+class VMEmulatorScript:
+    token_re = re.compile(r'"[^"]*"|[{},;]|[^\s{},;]+')
+    output_re = re.compile(r'(\w+)(?:\[(\d+)])?%([BDXS])(\d+)\.(\d+)\.(\d+)')
+    target_re = re.compile(r'(\w+)(?:\[(\d+)])?')
+
+    pointer_names = {'sp': 0, 'local': 1, 'argument': 2, 'this': 3, 'that': 4}
+    fixed_segments = {'temp': 5, 'pointer': 3}
+
+    def __init__(self, file_in, emulator=None, max_steps=10000000):
+        self._file_in = file_in
+        # how long a repeat with no count, which runs forever, is run
+        self._max_steps = max_steps
+        self._dir = os.path.dirname(os.path.abspath(file_in))
+        self._emulator = VMEmulator() if emulator is None else emulator
+        self._os_sources = []
+        self._output_list = []
+        self._output = None
+        self._compare = None
+        self._compare_line = 0
+        self._failed = False
+
+    def set_os(self, os_sources):
+        # .vm files of the OS, loaded along with the program
+        self._os_sources = list(os_sources)
+
+    def _tokenize(self):
+        script_file = open(self._file_in)
+        text = script_file.read()
+        script_file.close()
+
+        text = re.sub(r'/\*.*?\*/', ' ', text, flags=re.DOTALL)
+        text = re.sub(r'//[^\n]*', ' ', text)
+        return self.token_re.findall(text)
+
+    def _parse(self, tokens, pos=0):
+        # returns a list of commands, a repeat block is ('repeat', n, commands)
+        # with n None for a block repeated forever
+        commands = []
+        command = []
+
+        while pos < len(tokens):
+            token = tokens[pos]
+            pos += 1
+
+            if token in {',', ';'}:
+                if command:
+                    commands.append(command)
+                command = []
+            elif token == '{':
+                body, pos = self._parse(tokens, pos)
+                commands.append(('repeat', int(command[1]) if len(command) > 1 else None, body))
+                command = []
+            elif token == '}':
+                if command:
+                    commands.append(command)
+                return commands, pos
+            else:
+                command.append(token)
+
+        if command:
+            commands.append(command)
+        return commands, pos
+
+    def _address(self, target):
+        # RAM address of 'RAM[i]', 'sp', 'local', 'local[i]', 'temp[i]' and the like
+        name, index = self.target_re.fullmatch(target).groups()
+        index = None if index is None else int(index)
+
+        if name == 'RAM':
+            return index
+        if name in self.pointer_names:
+            if index is None:
+                return self.pointer_names[name]
+            return self._emulator.peek(self.pointer_names[name]) + index
+        if name in self.fixed_segments:
+            return self.fixed_segments[name] + index
+        raise ValueError(f'unknown variable {name}')
+
+    def _format(self, value, fmt, width):
+        if fmt == 'X':
+            return format(value & 0xFFFF, '04X')
+        if fmt == 'B':
+            return format(value & 0xFFFF, '016b')
+        return str(value)
+
+    def _write_output(self, line):
+        self._output.write(line + '\n')
+
+        if self._compare is not None:
+            expected = self._compare.readline().rstrip('\n')
+            self._compare_line += 1
+            if expected != line and not self._failed:
+                self._failed = True
+                print(f'Comparison failure at line {self._compare_line}')
+                print(f'  expected: {expected}')
+                print(f'  actual:   {line}')
+
+    def _output_header(self):
+        cells = []
+        for name, index, fmt, left, width, right in self._output_list:
+            title = name if index is None else f'{name}[{index}]'
+            total = left + width + right
+            cells.append(title[:total].center(total))
+        self._write_output('|' + '|'.join(cells) + '|')
+
+    def _output_values(self):
+        cells = []
+        for name, index, fmt, left, width, right in self._output_list:
+            target = name if index is None else f'{name}[{index}]'
+            value = self._format(self._emulator.peek(self._address(target)), fmt, width)
+            cells.append(' ' * left + value[-width:].rjust(width) + ' ' * right)
+        self._write_output('|' + '|'.join(cells) + '|')
+
+    def _execute(self, commands):
+        for command in commands:
+            if command[0] == 'repeat':
+                _, times, body = command
+                if times is None:
+                    self._execute_forever(body)
+                elif all(inner == ['vmstep'] for inner in body):
+                    # a plain run of steps goes straight to the inner loop
+                    self._emulator.run(times * len(body))
+                else:
+                    for _ in range(times):
+                        self._execute(body)
+                continue
+
+            name, args = command[0], command[1:]
+            if name == 'load':
+                # no file name loads every .vm file of the script's directory
+                source = self._dir if not args else os.path.join(self._dir, args[0])
+                self._emulator.load([source], self._os_sources)
+            elif name == 'output-file':
+                self._output = open(os.path.join(self._dir, args[0]), 'w')
+            elif name == 'compare-to':
+                self._compare = open(os.path.join(self._dir, args[0]))
+            elif name == 'output-list':
+                self._output_list = []
+                for arg in args:
+                    name, index, fmt, left, width, right = self.output_re.fullmatch(arg).groups()
+                    index = None if index is None else int(index)
+                    self._output_list.append((name, index, fmt, int(left), int(width), int(right)))
+                self._output_header()
+            elif name == 'output':
+                self._output_values()
+            elif name == 'set':
+                self._emulator.poke(self._address(args[0]), int(args[1]))
+            elif name == 'vmstep':
+                self._emulator.run(1)
+            elif name == 'echo':
+                print(' '.join(args).strip('"'))
+            else:
+                raise ValueError(f'unsupported script command {name}')
+
+    def _execute_forever(self, body):
+        # until the program runs off its end or max_steps have run; a pass
+        # that runs no steps stops it too
+        if all(inner == ['vmstep'] for inner in body):
+            self._emulator.run(self._max_steps)
+            return
+        start = self._emulator.steps
+        while self._emulator.steps - start < self._max_steps:
+            steps = self._emulator.steps
+            self._execute(body)
+            if self._emulator.steps == steps:
+                break
+
+    def run(self):
+        commands, _ = self._parse(self._tokenize())
+        try:
+            self._execute(commands)
+        finally:
+            if self._output is not None:
+                self._output.close()
+            if self._compare is not None:
+                self._compare.close()
+
+        if not self._failed:
+            print('End of script - Comparison ended successfully')
+        return not self._failed
@@ -0,0 +1,316 @@
+def _word(value):
+    # wraps to a signed 16-bit value, as the VM arithmetic does
+    return ((value + 0x8000) & 0xFFFF) - 0x8000
+
+
+class _PendingWrites:
+    # RAM as it would be after the writes made through this, which reach
+    # the real RAM only on commit
+    def __init__(self, ram):
+        self._ram = ram
+        self._writes = {}
+
+    def __getitem__(self, address):
+        value = self._writes.get(address)
+        return self._ram[address] if value is None else value
+
+    def __setitem__(self, address, value):
+        self._writes[address] = value
+
+    def commit(self):
+        for address, value in self._writes.items():
+            self._ram[address] = value
+
+
+class VMNativeOS:
+    # Python versions of tools/OS functions. Each one follows its .vm code
+    # step by step, so the heap layout and the OS's scratch arrays end up
+    # the same; only the stack above SP and the temp segment differ. A
+    # function returns None where the .vm code would call Sys.error, before
+    # changing any RAM, so that the emulator runs the .vm code instead
+    HEAP_BEGINNING = 2048
+    HEAP_END = 16379
+
+    def __init__(self, emulator):
+        self._emulator = emulator
+        self.ram = emulator.ram
+
+    def functions(self):
+        return {
+            'Math.abs': self.math_abs,
+            'Math.multiply': self.math_multiply,
+            'Math.divide': self.math_divide,
+            'Math.sqrt': self.math_sqrt,
+            'Math.max': self.math_max,
+            'Math.min': self.math_min,
+            'Memory.peek': self.memory_peek,
+            'Memory.poke': self.memory_poke,
+            'Memory.alloc': self.memory_alloc,
+            'Memory.deAlloc': self.memory_dealloc,
+            'Array.new': self.array_new,
+            'Array.dispose': self.array_dispose,
+            'String.new': self.string_new,
+            'String.dispose': self.string_dispose,
+            'String.length': self.string_length,
+            'String.charAt': self.string_char_at,
+            'String.setCharAt': self.string_set_char_at,
+            'String.appendChar': self.string_append_char,
+            'String.eraseLastChar': self.string_erase_last_char,
+            'String.intValue': self.string_int_value,
+            'String.setInt': self.string_set_int,
+            'String.newLine': lambda: 128,
+            'String.backSpace': lambda: 129,
+            'String.doubleQuote': lambda: 34,
+            'Sys.wait': self.sys_wait
+        }
+
+    def _math_array(self, index):
+        # base address of one of Math's arrays, None when Math is not loaded
+        address = self._emulator.static_addresses.get(f'Math.{index}')
+        return None if address is None else self.ram[address]
+
+    @staticmethod
+    def math_abs(x):
+        return _word(-x) if x < 0 else x
+
+    @staticmethod
+    def math_multiply(x, y):
+        return _word(x * y)
+
+    def math_divide(self, x, y):
+        if y == 0:
+            return None
+
+        negative = x < 0 < y or y < 0 < x
+        x = self.math_abs(x)
+
+        # multiples of y by powers of two, Math keeps them in its static 1
+        multiples = [self.math_abs(y)]
+        j = 0
+        over = False
+        while j < 15 and not over:
+            over = _word(32767 - _word(multiples[j] - 1)) < _word(multiples[j] - 1)
+            if not over:
+                multiples.append(_word(multiples[j] + multiples[j]))
+                over = _word(multiples[j + 1] - 1) > _word(x - 1)
+                if not over:
+                    j += 1
+
+        result = 0
+        while j > -1:
+            if not _word(multiples[j] - 1) > _word(x - 1):
+                result = _word(result + _word(1 << j))
+                x = _word(x - multiples[j])
+            j -= 1
+
+        scratch = self._math_array(1)
+        if scratch is not None:
+            self.ram[scratch:scratch + len(multiples)] = multiples
+
+        return _word(-result) if negative else result
+
+    def math_sqrt(self, x):
+        if x < 0:
+            return None
+        y = 0
+        for j in range(7, -1, -1):
+            candidate = _word(y + (1 << j))
+            square = _word(candidate * candidate)
+            if not square > x and not square < 0:
+                y = candidate
+        return y
+
+    @staticmethod
+    def math_max(a, b):
+        return a if a > b else b
+
+    @staticmethod
+    def math_min(a, b):
+        return a if a < b else b
+
+    def memory_peek(self, address):
+        return self.ram[address]
+
+    def memory_poke(self, address, value):
+        self.ram[address] = value
+        return 0
+
+    def memory_alloc(self, size):
+        return self._alloc(self.ram, size)
+
+    def _alloc(self, ram, size):
+        # first fit over blocks of [size, next], as in Memory.vm
+        if size < 1:
+            return None
+
+        segment = self.HEAP_BEGINNING
+        while ram[segment] < size:
+            segment = ram[segment + 1]
+        if _word(segment + size) > self.HEAP_END:
+            return None
+
+        if ram[segment] > _word(size + 2):
+            ram[segment + size + 2] = _word(ram[segment] - size - 2)
+            if ram[segment + 1] == segment + 2:
+                ram[segment + size + 3] = segment + size + 4
+            else:
+                ram[segment + size + 3] = ram[segment + 1]
+            ram[segment + 1] = segment + size + 2
+        ram[segment] = 0
+        return segment + 2
+
+    def memory_dealloc(self, address):
+        ram = self.ram
+        segment = address - 2
+        next_segment = ram[segment + 1]
+        if ram[next_segment] == 0:
+            ram[segment] = _word(ram[segment + 1] - segment - 2)
+        else:
+            ram[segment] = _word(ram[segment + 1] - segment + ram[next_segment])
+            if ram[next_segment + 1] == _word(next_segment + 2):
+                ram[segment + 1] = segment + 2
+            else:
+                ram[segment + 1] = ram[next_segment + 1]
+        return 0
+
+    def array_new(self, size):
+        if not size > 0:
+            return None
+        return self.memory_alloc(size)
+
+    def array_dispose(self, array):
+        return self.memory_dealloc(array)
+
+    # a String is [max length, chars array, length]
+
+    def string_new(self, max_length):
+        ram = self.ram
+        if max_length < 0:
+            return None
+        # both blocks are allocated on the side first, so if the second
+        # one does not fit the heap is left as it was for the .vm code
+        heap = _PendingWrites(ram)
+        string = self._alloc(heap, 3)
+        if string is None:
+            return None
+        if max_length > 0:
+            chars = self._alloc(heap, max_length)
+            if chars is None:
+                return None
+            heap[string + 1] = chars
+        heap.commit()
+        ram[string] = max_length
+        ram[string + 2] = 0
+        return string
+
+    def string_dispose(self, string):
+        if self.ram[string] > 0:
+            self.array_dispose(self.ram[string + 1])
+        return self.memory_dealloc(string)
+
+    def string_length(self, string):
+        return self.ram[string + 2]
+
+    def string_char_at(self, string, j):
+        ram = self.ram
+        if j < 0 or j >= ram[string + 2]:
+            return None
+        return ram[_word(j + ram[string + 1])]
+
+    def string_set_char_at(self, string, j, c):
+        ram = self.ram
+        if j < 0 or j >= ram[string + 2]:
+            return None
+        ram[_word(j + ram[string + 1])] = c
+        return 0
+
+    def string_append_char(self, string, c):
+        ram = self.ram
+        length = ram[string + 2]
+        if length == ram[string]:
+            return None
+        ram[_word(length + ram[string + 1])] = c
+        ram[string + 2] = _word(length + 1)
+        return string
+
+    def string_erase_last_char(self, string):
+        ram = self.ram
+        if ram[string + 2] == 0:
+            return None
+        ram[string + 2] = _word(ram[string + 2] - 1)
+        return 0
+
+    def string_int_value(self, string):
+        ram = self.ram
+        length = ram[string + 2]
+        if length == 0:
+            return 0
+        chars = ram[string + 1]
+
+        i = 0
+        negative = False
+        if ram[chars] == 45:
+            negative = True
+            i = 1
+
+        value = 0
+        while i < length:
+            digit = _word(ram[_word(i + chars)] - 48)
+            if digit < 0 or digit > 9:
+                break
+            value = _word(_word(value * 10) + digit)
+            i += 1
+        return _word(-value) if negative else value
+
+    def string_set_int(self, string, number):
+        ram = self.ram
+        if ram[string] == 0:
+            return None
+
+        negative = number < 0
+        if negative:
+            number = _word(-number)
+
+        # the length is known up front, so a too short string falls back
+        # to the .vm code before anything is written
+        digits = []
+        rest = number
+        while rest > 0:
+            digits.append(rest % 10)
+            rest //= 10
+        if ram[string] < len(digits) + negative:
+            return None
+
+        buffer = self.array_new(6)
+        if buffer is None:
+            return None
+
+        # setInt writes the digits backwards into a buffer first, and
+        # divides by 10, which leaves Math's scratch array as it would
+        count = 0
+        while number > 0:
+            quotient = self.math_divide(number, 10)
+            ram[count + buffer] = _word(48 + number - quotient * 10)
+            count += 1
+            number = quotient
+        if negative:
+            ram[count + buffer] = 45
+            count += 1
+
+        chars = ram[string + 1]
+        if count == 0:
+            ram[chars] = 48
+            ram[string + 2] = 1
+        else:
+            for i in range(count):
+                ram[i + chars] = ram[count - i - 1 + buffer]
+            ram[string + 2] = count
+
+        self.array_dispose(buffer)
+        return 0
+
+    def sys_wait(self, duration):
+        # a busy loop with no effect on RAM
+        if duration < 0:
+            return None
+        return 0
@@ -0,0 +1,244 @@
+import os
+import sys
+import glob
+import time
+import random
+import shutil
+import argparse
+import tempfile
+
+# the projects/12 tests are Jack, compiled by the project 10 compiler
+PROJECTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+COMPILER_DIR = os.path.join(PROJECTS_DIR, '10', 'CompilerSyntaxAnalyzer')
+if COMPILER_DIR not in sys.path:
+    sys.path.append(COMPILER_DIR)
+
+from vm_emulator import VMEmulator
+from jack_compiler import JackCompiler
+
+
+class VMNativeOSConformance:
+    # runs a program once on the OS .vm code and once with native OS
+    # functions, up to Sys.halt, and compares the RAM the program can see:
+    # all of it except the temp segment and the stack above SP
+    CHUNK_STEPS = 100
+    TEMP_SEGMENT = range(5, 13)
+    HEAP_BEGINNING = 2048
+
+    def __init__(self, os_dir, max_steps=100000000):
+        self._os_dir = os_dir
+        self._max_steps = max_steps
+
+    def _run(self, source, native):
+        emulator = VMEmulator(native)
+        emulator.load([source], [self._os_dir])
+        emulator.bootstrap()
+
+        # Sys.halt is a loop in a function of its own
+        addresses = sorted(emulator.functions.values()) + [len(emulator.commands)]
+        halt = emulator.functions['Sys.halt']
+        halt_end = addresses[addresses.index(halt) + 1]
+
+        start = time.perf_counter()
+        while emulator.steps < self._max_steps and not halt <= emulator.pc < halt_end:
+            emulator.run(self.CHUNK_STEPS)
+        # the top of the loop, where the stack is as Sys.halt found it
+        while halt <= emulator.pc < halt_end and emulator.pc != halt + 1:
+            emulator.run(1)
+        return emulator, time.perf_counter() - start
+
+    def _visible_ram(self, emulator):
+        ram = list(emulator.ram)
+        for address in self.TEMP_SEGMENT:
+            ram[address] = 0
+        ram[ram[0]:self.HEAP_BEGINNING] = [0] * (self.HEAP_BEGINNING - ram[0])
+        return ram
+
+    def check(self, source):
+        # returns whether RAM matches, and prints the step counts and times
+        vm, vm_seconds = self._run(source, False)
+        native, native_seconds = self._run(source, True)
+
+        vm_ram = self._visible_ram(vm)
+        native_ram = self._visible_ram(native)
+        mismatches = [address for address in range(len(vm_ram)) if vm_ram[address] != native_ram[address]]
+
+        print(f'{source}: {vm.steps} -> {native.steps} steps, {vm_seconds:.3f}s -> {native_seconds:.3f}s')
+        for address in mismatches[:10]:
+            print(f'  RAM[{address}]: {vm_ram[address]} with .vm code, {native_ram[address]} native')
+        if len(mismatches) > 10:
+            print(f'  ... {len(mismatches) - 10} more')
+        return not mismatches
+
+
+def compile_tests(directory, tests_dir=os.path.join(PROJECTS_DIR, '12')):
+    # copies of the projects/12 test programs compiled in directory; the
+    # ones that wait for a key never reach Sys.halt and are left out
+    sources = []
+    for test in sorted(glob.glob(os.path.join(tests_dir, '*Test'))):
+        name = os.path.basename(test)
+        if name in ('KeyboardTest', 'SysTest'):
+            continue
+        source = os.path.join(directory, name)
+        shutil.copytree(test, source)
+        JackCompiler().compile(source)
+        sources.append(source)
+    return sources
+
+
+class RandomOSProgram:
+    # a Main.main that calls OS functions with random arguments; results
+    # go to static 0-15 and the objects it works on to static 16-23
+    RESULTS = 16
+    OBJECTS = 8
+
+    def __init__(self, seed):
+        self._random = random.Random(seed)
+        self._lines = []
+        # slot -> ('array', size) or ('string', max length, length)
+        self._objects = {}
+
+    def _push(self, value):
+        self._lines.append(f'push constant {abs(value)}')
+        if value < 0:
+            self._lines.append('neg')
+        return value
+
+    def _constant(self, low, high):
+        return self._push(self._random.randint(low, high))
+
+    def _call(self, function, n_args, slot=None):
+        self._lines.append(f'call {function} {n_args}')
+        if slot is None:
+            slot = self._random.randrange(self.RESULTS)
+        self._lines.append(f'pop static {slot}')
+
+    def _math(self):
+        function = self._random.choice(['multiply', 'divide', 'min', 'max', 'abs', 'sqrt'])
+        if function == 'sqrt':
+            self._constant(0, 32767)
+            self._call('Math.sqrt', 1)
+        elif function == 'abs':
+            self._constant(-32767, 32767)
+            self._call('Math.abs', 1)
+        else:
+            self._constant(-32767, 32767)
+            bound = self._random.choice([10, 300, 32767])
+            value = 0
+            while value == 0:
+                value = self._random.randint(-bound, bound)
+            self._push(value)
+            self._call(f'Math.{function}', 2)
+
+    def _new(self, slot):
+        if self._random.random() < 0.5:
+            size = self._random.randint(1, 40)
+            self._lines.append(f'push constant {size}')
+            self._call('Array.new', 1, self.RESULTS + slot)
+            self._objects[slot] = ('array', size)
+        else:
+            max_length = self._random.randint(0, 12)
+            self._lines.append(f'push constant {max_length}')
+            self._call('String.new', 1, self.RESULTS + slot)
+            self._objects[slot] = ('string', max_length, 0)
+
+    def _use(self, slot):
+        kind = self._objects[slot]
+        this = f'push static {self.RESULTS + slot}'
+
+        if self._random.random() < 0.15:
+            self._lines.append(this)
+            self._call('Array.dispose' if kind[0] == 'array' else 'String.dispose', 1)
+            del self._objects[slot]
+        elif kind[0] == 'array':
+            self._lines.append(this)
+            self._constant(0, kind[1] - 1)
+            self._lines.append('add')
+            if self._random.random() < 0.5:
+                self._constant(-32767, 32767)
+                self._call('Memory.poke', 2)
+            else:
+                self._call('Memory.peek', 1)
+        else:
+            _, max_length, length = kind
+            choices = ['length', 'intValue']
+            if length < max_length:
+                choices.append('appendChar')
+            if length > 0:
+                choices += ['eraseLastChar', 'charAt', 'setCharAt']
+            if max_length >= 6:
+                choices.append('setInt')
+            choice = self._random.choice(choices)
+
+            self._lines.append(this)
+            if choice == 'appendChar':
+                self._constant(45, 57)
+                length += 1
+                self._call('String.appendChar', 2)
+            elif choice == 'eraseLastChar':
+                length -= 1
+                self._call('String.eraseLastChar', 1)
+            elif choice == 'charAt':
+                self._constant(0, length - 1)
+                self._call('String.charAt', 2)
+            elif choice == 'setCharAt':
+                self._constant(0, length - 1)
+                self._constant(45, 57)
+                self._call('String.setCharAt', 3)
+            elif choice == 'setInt':
+                value = self._constant(-32767, 32767)
+                length = len(str(value))
+                self._call('String.setInt', 2)
+            else:
+                self._call(f'String.{choice}', 1)
+            self._objects[slot] = ('string', max_length, length)
+
+    def write(self, directory, calls):
+        for _ in range(calls):
+            slot = self._random.randrange(self.OBJECTS)
+            if self._random.random() < 0.4:
+                self._math()
+            elif slot in self._objects:
+                self._use(slot)
+            else:
+                self._new(slot)
+
+        # some end in Sys.error, where the .vm code takes over
+        if self._random.random() < 0.25:
+            self._constant(-32767, 32767)
+            self._push(0)
+            self._call('Math.divide', 2)
+
+        vm_file = open(os.path.join(directory, 'Main.vm'), 'w')
+        vm_file.write('function Main.main 0\n')
+        vm_file.write('\n'.join(self._lines))
+        vm_file.write('\npush constant 0\nreturn\n')
+        vm_file.close()
+
+
+if __name__ == '__main__':
+    default_os = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'tools', 'OS')
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument('sources', nargs='*',
+                        help='directories of compiled programs, the compiled projects/12 tests by default')
+    parser.add_argument('--os', default=default_os, help='directory of the OS .vm files')
+    parser.add_argument('--random', type=int, default=20, metavar='N', help='number of random programs to check')
+    parser.add_argument('--calls', type=int, default=300, help='OS calls in each random program')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    conformance = VMNativeOSConformance(args.os)
+    if args.sources:
+        passed = all([conformance.check(source) for source in args.sources])
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            passed = all([conformance.check(source) for source in compile_tests(directory)])
+
+    for i in range(args.random):
+        with tempfile.TemporaryDirectory() as directory:
+            RandomOSProgram(args.seed + i).write(directory, args.calls)
+            passed = conformance.check(directory) and passed
+
+    print('Native OS matches the .vm code' if passed else 'Native OS differs from the .vm code')
+    sys.exit(0 if passed else 1)
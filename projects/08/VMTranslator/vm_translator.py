@@ -1,14 +1,21 @@
-import sys
-import re
+import io
 import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
 from singleton import Singleton
 from vm_translator_writer import VMTranslatorWriter
+from peephole_optimizer import PeepholeOptimizer
+from call_graph import CallGraph
+import common_path
+from instrumentation import Instrumentation
 
 
 class VMTranslator(metaclass=Singleton):
 
-    def _translate_command(self, line, writer):
+    def translate_command(self, line, writer):
+        # one VM command, its comment and surrounding whitespace removed,
+        # written to writer
         words = line.split()
         command = words[0]
         args = words[1:]
@@ -48,7 +55,9 @@ class VMTranslator(metaclass=Singleton):
         elif command == 'gt':
             writer.translate_cmp('JGT')
 
-    def _explore_source(self, source):
+    def explore_source(self, source):
+        # the .vm files of a file or directory source, and the .asm file
+        # they are translated to
         abs_source = os.path.abspath(source)
         source_name = os.path.split(abs_source)[-1]
 
@@ -60,44 +69,143 @@ class VMTranslator(metaclass=Singleton):
                 raise ValueError
         else:
             files_in = [os.path.join(source, file)
-                        for file in os.listdir(source) if file.endswith('.vm')]
+                        for file in sorted(os.listdir(source)) if file.endswith('.vm')]
             file_out = os.path.join(source, source_name + '.asm')
 
         return files_in, file_out
 
-    def translate(self, source):
-        files_in, file_out = self._explore_source(source)
+    def translate_file(self, file_in, compact=False, comments=True, functions=None):
+        # returns the file's code and the shared routines it uses; with
+        # functions given, the others are left out
+        with Instrumentation.phase('vm_translator.translate', file_in) as phase:
+            output = io.StringIO()
+            writer = VMTranslatorWriter(output, compact)
+            writer.set_file_name(os.path.splitext(os.path.basename(file_in))[0])
+            skipping = False
 
-        output = open(file_out, 'w')
-        writer = VMTranslatorWriter(output)
-
-        if len(files_in) > 1:
-            output.write('// Bootstrap\n')
-            writer.bootstrap()
-
-        for file_in in files_in:
             vm_file = open(file_in, 'r')
-            for line in vm_file.readlines():
+            for line in Instrumentation.counted(vm_file, phase, 'vm_lines'):
                 # delete comment
-                comment = re.search('//', line)
-                if comment is not None:
-                    line = line[:comment.start()]
+                comment = line.find('//')
+                if comment != -1:
+                    line = line[:comment]
 
                 # check if empty
                 line = line.strip()
                 if line == '':
                     continue
 
-                output.write('// ' + line + '\n')
-                self._translate_command(line, writer)
+                if functions is not None:
+                    if line.startswith('function'):
+                        skipping = line.split()[1] not in functions
+                    if skipping:
+                        continue
+
+                if comments:
+                    writer.comment(line)
+                self.translate_command(line, writer)
             vm_file.close()
 
-        output.close()
+            writer.flush()
+
+        code = output.getvalue()
+        # counted outside the timed phase, and only when it is recorded
+        if Instrumentation.enabled:
+            phase.counts['asm_lines'] = code.count('\n')
+        return code, writer.shared_used
+
+    def translate(self, source, optimizer=None, compact=False, comments=True, jobs=1, call_graph=None):
+        files_in, file_out = self.explore_source(source)
+
+        # with a call graph, only functions reachable from Sys.init are kept
+        functions = None
+        if call_graph is not None:
+            with Instrumentation.phase('vm_translator.call_graph', source) as phase:
+                for file_in in files_in:
+                    call_graph.add_file(file_in)
+                functions = call_graph.reachable()
+            if Instrumentation.enabled:
+                phase.counts['functions'] = len(call_graph.functions)
+
+        # files are translated independently, in parallel if asked to, and
+        # linked in sorted file name order whatever order they finish in
+        if jobs == 1 or len(files_in) < 2:
+            parts = [self.translate_file(file_in, compact, comments, functions) for file_in in files_in]
+        else:
+            files_num = len(files_in)
+            with ProcessPoolExecutor(jobs) as executor:
+                parts = list(executor.map(_translate_file, files_in, [compact] * files_num, [comments] * files_num,
+                                          [functions] * files_num))
+
+        code = self.link(parts, len(files_in) > 1, optimizer, compact, comments)
+        with Instrumentation.phase('vm_translator.write', file_out):
+            output = open(file_out, 'w')
+            output.write(code)
+            output.close()
+
+    def link(self, parts, bootstrap=True, optimizer=None, compact=False, comments=True):
+        # the whole program from the translate_file parts of its files
+        with Instrumentation.phase('vm_translator.link') as phase:
+            output = io.StringIO()
+            writer = VMTranslatorWriter(output, compact)
+
+            if bootstrap:
+                if comments:
+                    writer.comment('Bootstrap')
+                writer.bootstrap()
+            writer.flush()
+
+            for code, shared_used in parts:
+                output.write(code)
+                writer.shared_used |= shared_used
+
+            if compact:
+                writer.shared_routines()
+            writer.flush()
+        if Instrumentation.enabled:
+            phase.counts['files'] = len(parts)
+
+        # the optimizer needs the whole program, so it is buffered first
+        if optimizer is not None:
+            with Instrumentation.phase('vm_translator.optimize') as phase:
+                lines = optimizer.optimize(output.getvalue().splitlines())
+            if Instrumentation.enabled:
+                phase.counts['instructions_in'] = optimizer.lines_in
+                phase.counts['instructions_out'] = optimizer.lines_out
+            return ''.join(line + '\n' for line in lines)
+        return output.getvalue()
+
+
+def _translate_file(file_in, compact, comments, functions):
+    return VMTranslator().translate_file(file_in, compact, comments, functions)
 
 
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print('No arguments')
-    else:
-        for arg in sys.argv[1:]:
-            VMTranslator().translate(arg)
+    parser = argparse.ArgumentParser()
+    parser.add_argument('sources', nargs='+', help='.vm files or directories of them')
+    parser.add_argument('-O', '--optimize', action='store_true', help='run the peephole optimizer on the output')
+    parser.add_argument('--compact', action='store_true',
+                        help='share one call, return and compare routine instead of inlining them, '
+                             'smaller ROM for a few more cycles per call')
+    parser.add_argument('--no-comments', dest='comments', action='store_false',
+                        help='do not echo each VM command as a comment')
+    parser.add_argument('--drop-unreachable', action='store_true',
+                        help='leave out functions not reachable from Sys.init and report them')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes for the files of a directory')
+    parser.add_argument('--instrument', metavar='FILE',
+                        help='write per-phase times and counts as JSON, phases in worker processes not included')
+    parser.add_argument('--profile', metavar='FILE', help='dump cProfile stats of the run')
+    args = parser.parse_args()
+
+    def translate():
+        for arg in args.sources:
+            optimizer = PeepholeOptimizer() if args.optimize else None
+            call_graph = CallGraph() if args.drop_unreachable else None
+            VMTranslator().translate(arg, optimizer, args.compact, args.comments, args.jobs, call_graph)
+            if call_graph is not None:
+                print(f'{arg}: ' + '\n'.join(call_graph.report()))
+            if optimizer is not None:
+                print(f'{arg}: {optimizer.lines_in} -> {optimizer.lines_out} instructions')
+
+    Instrumentation.run(translate, args.instrument, args.profile)
@@ -0,0 +1,52 @@
+import sys
+import os
+import time
+import shutil
+import tempfile
+
+from vm_translator import VMTranslator
+
+
+def _vm_lines(source):
+    files = [source] if os.path.isfile(source) else \
+        [os.path.join(source, file) for file in os.listdir(source) if file.endswith('.vm')]
+    lines_num = 0
+    for file in files:
+        vm_file = open(file)
+        lines_num += sum(1 for _ in vm_file)
+        vm_file.close()
+    return lines_num
+
+
+def benchmark(source, repeat=5, **options):
+    # translate a copy, so no .asm is left next to the sources
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        copy = os.path.join(tmp_dir, os.path.basename(os.path.abspath(source)))
+        if os.path.isfile(source):
+            shutil.copy(source, copy)
+        else:
+            shutil.copytree(source, copy)
+
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            VMTranslator().translate(copy, **options)
+            elapsed = time.perf_counter() - start
+            if best is None or elapsed < best:
+                best = elapsed
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    return _vm_lines(source), best
+
+
+if __name__ == '__main__':
+    sources = sys.argv[1:]
+    if len(sources) == 0:
+        sources = [os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', 'tools', 'OS')]
+
+    for source in sources:
+        lines_num, seconds = benchmark(source)
+        print(f'{os.path.basename(os.path.abspath(source))}: {lines_num} lines in {seconds * 1000:.1f} ms, '
+              f'{lines_num / seconds:,.0f} lines/s')
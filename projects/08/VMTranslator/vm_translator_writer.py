@@ -1,7 +1,10 @@
 class VMTranslatorWriter:
+    FLUSH_SIZE = 4096
 
-    def __init__(self, file):
+    def __init__(self, file, compact=False):
         self._file = file
+        self._buffer = []
+        self._compact = compact
         self._segment_pointer = {'local': 1, 'argument': 2, 'this': 3, 'that': 4}
         self._stack_beginning = 256
         self._temp_beginning = 5
@@ -10,23 +13,39 @@ class VMTranslatorWriter:
         self._return_address_reg = 15
 
         self._static_name = None
+        self._cmp_prefix = 'CMP'
         self._function_name = ''
         self._function_calls = 0
         self._cmp_num = 0
+        self.shared_used = set()
 
     def _write(self, s):
-        self._file.write(s)
+        # lines are collected and handed to the file in chunks
+        self._buffer.append(s)
+        if len(self._buffer) >= self.FLUSH_SIZE:
+            self.flush()
+
+    def flush(self):
+        self._file.write(''.join(self._buffer))
+        self._buffer = []
+
+    def set_file_name(self, file_name):
+        # labels of one file never clash with another's, so files can be
+        # translated separately and linked afterwards
+        self._static_name = file_name
+        self._cmp_prefix = f'{file_name}.CMP'
+
+    def comment(self, text):
+        self._write(f'// {text}\n')
 
     def _a_command(self, address):
-        self._write('@' + str(address) + '\n')
+        self._write(f'@{address}\n')
 
     def _c_command(self, dest, comp, jmp=None):
-        if dest is not None:
-            self._write(dest + '=')
-        self._write(comp)
-        if jmp is not None:
-            self._write(';' + jmp)
-        self._write('\n')
+        if dest is None:
+            self._write(f'{comp};{jmp}\n' if jmp is not None else f'{comp}\n')
+        else:
+            self._write(f'{dest}={comp};{jmp}\n' if jmp is not None else f'{dest}={comp}\n')
 
     def _init_label(self, label):
         self._write(f'({label})\n')
@@ -128,16 +147,24 @@ class VMTranslatorWriter:
 
     def translate_cmp(self, condition):
         self._cmp_num += 1
+        if self._compact:
+            self._a_command(f'{self._cmp_prefix}.{self._cmp_num}.END')
+            self._c_command('D', 'A')
+            self._goto_label(None, '0', 'JMP', f'$$CMP.{condition}')
+            self._init_label(f'{self._cmp_prefix}.{self._cmp_num}.END')
+            self.shared_used.add(condition)
+            return
+
         self._stack_pop_then_top()
         self._c_command('D', 'M-D')
-        self._goto_label(None, 'D', condition, f'CMP.{self._cmp_num}.TRUE')
+        self._goto_label(None, 'D', condition, f'{self._cmp_prefix}.{self._cmp_num}.TRUE')
         self._stack_top()
         self._c_command('M', '0')
-        self._goto_label(None, '0', 'JMP', f'CMP.{self._cmp_num}.END')
-        self._init_label(f'CMP.{self._cmp_num}.TRUE')
+        self._goto_label(None, '0', 'JMP', f'{self._cmp_prefix}.{self._cmp_num}.END')
+        self._init_label(f'{self._cmp_prefix}.{self._cmp_num}.TRUE')
         self._stack_top()
         self._c_command('M', '-1')
-        self._init_label(f'CMP.{self._cmp_num}.END')
+        self._init_label(f'{self._cmp_prefix}.{self._cmp_num}.END')
 
     def translate_push(self, args):
         if args[0] == 'constant':
@@ -173,9 +200,26 @@ class VMTranslatorWriter:
 
     def translate_call(self, args):
         self._function_calls += 1
+        return_label = self._function_name + '$ret.' + str(self._function_calls)
+
+        if self._compact:
+            self._a_command(5 + int(args[1]))
+            self._c_command('D', 'A')
+            self._a_command(self._end_frame_reg)
+            self._c_command('M', 'D')
+            self._a_command(args[0])
+            self._c_command('D', 'A')
+            self._a_command(self._tmp_reg)
+            self._c_command('M', 'D')
+            self._a_command(return_label)
+            self._c_command('D', 'A')
+            self._goto_label(None, '0', 'JMP', '$$CALL')
+            self._init_label(return_label)
+            self.shared_used.add('call')
+            return
 
         # push return address
-        self._a_command(self._function_name + '$ret.' + str(self._function_calls))
+        self._a_command(return_label)
         self._c_command('D', 'A')
         self._stack_push()
 
@@ -205,7 +249,7 @@ class VMTranslatorWriter:
         self._goto_label(None, '0', 'JMP', args[0])
 
         # return label
-        self._init_label(self._function_name + '$ret.' + str(self._function_calls))
+        self._init_label(return_label)
 
     def translate_function(self, args):
         self._init_label(args[0])
@@ -218,6 +262,13 @@ class VMTranslatorWriter:
             self._stack_push()
 
     def translate_return(self):
+        if self._compact:
+            self._goto_label(None, '0', 'JMP', '$$RETURN')
+            self.shared_used.add('return')
+        else:
+            self._return()
+
+    def _return(self):
         # copy LCL
         self._a_command(self._segment_pointer['local'])
         self._c_command('D', 'M')
@@ -263,3 +314,61 @@ class VMTranslatorWriter:
         self._a_command('SP')
         self._c_command('M', 'D')
         self.translate_call(['Sys.init', '0'])
+
+    def shared_routines(self):
+        # compact mode: call sites jump to these instead of inlining the
+        # code, with parameters in D and R13-R15; only the used ones are
+        # written, behind a jump for programs that run off their end
+        if not self.shared_used:
+            return
+
+        self._goto_label(None, '0', 'JMP', '$$END')
+
+        # D = return address, R13 = function, R14 = 5 + number of args
+        if 'call' in self.shared_used:
+            self._init_label('$$CALL')
+            self._stack_push()
+            for i in range(1, 5):
+                self._a_command(i)
+                self._c_command('D', 'M')
+                self._stack_push()
+            self._a_command(self._end_frame_reg)
+            self._c_command('D', 'M')
+            self._a_command('SP')
+            self._c_command('D', 'M-D')
+            self._a_command(self._segment_pointer['argument'])
+            self._c_command('M', 'D')
+            self._a_command('SP')
+            self._c_command('D', 'M')
+            self._a_command(self._segment_pointer['local'])
+            self._c_command('M', 'D')
+            self._a_command(self._tmp_reg)
+            self._c_command('A', 'M')
+            self._c_command(None, '0', 'JMP')
+
+        if 'return' in self.shared_used:
+            self._init_label('$$RETURN')
+            self._return()
+
+        # D = return address
+        for condition in ('JEQ', 'JLT', 'JGT'):
+            if condition not in self.shared_used:
+                continue
+            self._init_label(f'$$CMP.{condition}')
+            self._a_command(self._return_address_reg)
+            self._c_command('M', 'D')
+            self._stack_pop_then_top()
+            self._c_command('D', 'M-D')
+            self._goto_label(None, 'D', condition, f'$$CMP.{condition}.TRUE')
+            self._stack_top()
+            self._c_command('M', '0')
+            self._goto_label(None, '0', 'JMP', f'$$CMP.{condition}.END')
+            self._init_label(f'$$CMP.{condition}.TRUE')
+            self._stack_top()
+            self._c_command('M', '-1')
+            self._init_label(f'$$CMP.{condition}.END')
+            self._a_command(self._return_address_reg)
+            self._c_command('A', 'M')
+            self._c_command(None, '0', 'JMP')
+
+        self._init_label('$$END')
@@ -0,0 +1,138 @@
+# parse tree of one .jack class. Names, types and constants are kept as
+# their tokens, so their line and column stay at hand; keywords and
+# symbols the grammar implies are not stored
+
+
+class ClassNode:
+    __slots__ = ('name', 'var_decs', 'subroutines')
+
+    def __init__(self, name, var_decs, subroutines):
+        self.name = name
+        self.var_decs = var_decs
+        self.subroutines = subroutines
+
+
+class ClassVarDecNode:
+    # kind is the 'static' or 'field' token
+    __slots__ = ('kind', 'var_type', 'names')
+
+    def __init__(self, kind, var_type, names):
+        self.kind = kind
+        self.var_type = var_type
+        self.names = names
+
+
+class SubroutineNode:
+    # kind is the 'constructor', 'function' or 'method' token, parameters
+    # are (type, name) token pairs
+    __slots__ = ('kind', 'return_type', 'name', 'parameters', 'var_decs', 'statements')
+
+    def __init__(self, kind, return_type, name, parameters, var_decs, statements):
+        self.kind = kind
+        self.return_type = return_type
+        self.name = name
+        self.parameters = parameters
+        self.var_decs = var_decs
+        self.statements = statements
+
+
+class VarDecNode:
+    __slots__ = ('var_type', 'names')
+
+    def __init__(self, var_type, names):
+        self.var_type = var_type
+        self.names = names
+
+
+class LetNode:
+    # index is None unless an array entry is assigned
+    __slots__ = ('name', 'index', 'value')
+
+    def __init__(self, name, index, value):
+        self.name = name
+        self.index = index
+        self.value = value
+
+
+class IfNode:
+    # else_statements is None without an else branch
+    __slots__ = ('condition', 'statements', 'else_statements')
+
+    def __init__(self, condition, statements, else_statements):
+        self.condition = condition
+        self.statements = statements
+        self.else_statements = else_statements
+
+
+class WhileNode:
+    __slots__ = ('condition', 'statements')
+
+    def __init__(self, condition, statements):
+        self.condition = condition
+        self.statements = statements
+
+
+class DoNode:
+    __slots__ = ('call',)
+
+    def __init__(self, call):
+        self.call = call
+
+
+class ReturnNode:
+    # value is None for a bare return
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class ExpressionNode:
+    # terms joined left to right, ops[i] between terms[i] and terms[i + 1]
+    __slots__ = ('terms', 'ops')
+
+    def __init__(self, terms, ops):
+        self.terms = terms
+        self.ops = ops
+
+
+class ConstantNode:
+    # an integer, string or keyword constant token
+    __slots__ = ('token',)
+
+    def __init__(self, token):
+        self.token = token
+
+
+class VariableNode:
+    # index is None unless an array entry is read
+    __slots__ = ('name', 'index')
+
+    def __init__(self, name, index):
+        self.name = name
+        self.index = index
+
+
+class CallNode:
+    # receiver is the class or variable name token before the '.', or None
+    __slots__ = ('receiver', 'name', 'arguments')
+
+    def __init__(self, receiver, name, arguments):
+        self.receiver = receiver
+        self.name = name
+        self.arguments = arguments
+
+
+class UnaryNode:
+    __slots__ = ('op', 'term')
+
+    def __init__(self, op, term):
+        self.op = op
+        self.term = term
+
+
+class ParenthesizedNode:
+    __slots__ = ('expression',)
+
+    def __init__(self, expression):
+        self.expression = expression
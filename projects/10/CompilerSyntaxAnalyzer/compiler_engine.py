@@ -1,231 +1,259 @@
 from compiler_tokenizer import CompilerTokenizer
 from compiler_token import TokenType
+from compiler_ast import ClassNode, ClassVarDecNode, SubroutineNode, VarDecNode, LetNode, IfNode, WhileNode, \
+    DoNode, ReturnNode, ExpressionNode, ConstantNode, VariableNode, CallNode, UnaryNode, ParenthesizedNode
+from compiler_xml_writer import CompilerXMLWriter
+import common_path
+from instrumentation import Instrumentation
 
 
 class CompilerEngine:
+    binary_ops = {'+', '-', '*', '/', '&', '|', '<', '>', '='}
+    # tokens of these types are matched by value, the others by type
+    value_types = {TokenType.KEYWORD, TokenType.SYMBOL}
 
-    def __init__(self, tokenizer, file_out):
+    def __init__(self, tokenizer, file_out=None):
         self._tokenizer = tokenizer
         self.file_out = file_out
-        self.output = None
+
+        # predictive parsing: the next token alone decides what follows
+        self._statement_compilers = {
+            'let': self._compile_let_statement,
+            'if': self._compile_if_statement,
+            'while': self._compile_while_statement,
+            'do': self._compile_do_statement,
+            'return': self._compile_return_statement
+        }
+        self._term_compilers = {
+            TokenType.INTEGER: self._compile_constant_term,
+            TokenType.STRING: self._compile_constant_term,
+            'true': self._compile_constant_term,
+            'false': self._compile_constant_term,
+            'null': self._compile_constant_term,
+            'this': self._compile_constant_term,
+            TokenType.IDENTIFIER: self._compile_identifier_term,
+            '(': self._compile_parenthesized_term,
+            '-': self._compile_unary_term,
+            '~': self._compile_unary_term
+        }
 
     def start(self):
-        self.output = open(self.file_out, 'w')
-        self._compile_class()
-        self.output.close()
+        # parses the class and writes it to file_out as XML
+        CompilerXMLWriter(self.file_out).write(self.parse())
+
+    def parse(self):
+        # with a token stream, scanning is timed as part of the parse
+        with Instrumentation.phase('compiler.parse', self.file_out or '') as phase:
+            class_node = self._compile_class()
+        if Instrumentation.enabled:
+            phase.counts['subroutines'] = len(class_node.subroutines)
+        return class_node
 
-    def _open_tag(self, tag):
-        self.output.write(f'<{tag}>\n')
+    def _key(self, token):
+        return token.val if token.token_type in self.value_types else token.token_type
 
-    def _close_tag(self, tag):
-        self.output.write(f'</{tag}>\n')
+    def _peek_key(self):
+        try:
+            token = self._tokenizer.peek_token()
+        except IndexError:
+            raise SyntaxError('unexpected end of file')
+        return self._key(token)
 
-    def _write_token_tag(self, token):
-        self.output.write(f'<{CompilerTokenizer.token_type_str[token.token_type]}>')
-        self.output.write(token.val.
-                          replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;'))
-        self.output.write(f'</{CompilerTokenizer.token_type_str[token.token_type]}>\n')
+    def _error(self, token, expected):
+        names = [CompilerTokenizer.token_type_str[option] if isinstance(option, TokenType) else repr(option)
+                 for option in expected]
+        return SyntaxError(f'line {token.line}, column {token.column}: '
+                           f'expected {" or ".join(names)}, got {token.val!r}')
 
     def _read(self, *options):
         token = self._tokenizer.advance()
-        for option in options:
-            if token.token_type == option or token.val == option:
-                self._write_token_tag(token)
-                return
-        raise SyntaxError
+        if self._key(token) not in options:
+            raise self._error(token, options)
+        return token
 
     def _compile_class(self):
-        self._open_tag('class')
         self._read('class')
-        self._read(TokenType.IDENTIFIER)
+        name = self._read(TokenType.IDENTIFIER)
         self._read('{')
-        while self._tokenizer.peek_token().val in {'static', 'field'}:
-            self._compile_class_var_dec()
-        while self._tokenizer.peek_token().val in {'constructor', 'function', 'method'}:
-            self._compile_subroutine_dec()
+        var_decs = []
+        while self._peek_key() in {'static', 'field'}:
+            var_decs.append(self._compile_class_var_dec())
+        subroutines = []
+        while self._peek_key() in {'constructor', 'function', 'method'}:
+            subroutines.append(self._compile_subroutine_dec())
         self._read('}')
-        self._close_tag('class')
+        return ClassNode(name, var_decs, subroutines)
 
     def _compile_class_var_dec(self):
-        self._open_tag('classVarDec')
-        self._read('static', 'field')
-        self._compile_type()
-        self._read(TokenType.IDENTIFIER)
-        while self._tokenizer.peek_token().val == ',':
+        kind = self._read('static', 'field')
+        var_type = self._compile_type()
+        names = self._compile_names()
+        return ClassVarDecNode(kind, var_type, names)
+
+    def _compile_names(self):
+        # one or more comma separated names up to the ';'
+        names = [self._read(TokenType.IDENTIFIER)]
+        while self._peek_key() == ',':
             self._read(',')
-            self._read(TokenType.IDENTIFIER)
+            names.append(self._read(TokenType.IDENTIFIER))
         self._read(';')
-        self._close_tag('classVarDec')
+        return names
 
     def _compile_type(self):
-        self._read('int', 'char', 'boolean', TokenType.IDENTIFIER)
+        return self._read('int', 'char', 'boolean', TokenType.IDENTIFIER)
 
     def _compile_type_void(self):
-        self._read('int', 'char', 'boolean', 'void', TokenType.IDENTIFIER)
+        return self._read('int', 'char', 'boolean', 'void', TokenType.IDENTIFIER)
 
     def _compile_subroutine_dec(self):
-        self._open_tag('subroutineDec')
-        self._read('constructor', 'function', 'method')
-        self._compile_type_void()
-        self._read(TokenType.IDENTIFIER)
+        kind = self._read('constructor', 'function', 'method')
+        return_type = self._compile_type_void()
+        name = self._read(TokenType.IDENTIFIER)
         self._read('(')
-        self._compile_parameter_list()
+        parameters = self._compile_parameter_list()
         self._read(')')
-        self._compile_subroutine_body()
-        self._close_tag('subroutineDec')
+        self._read('{')
+        var_decs = []
+        while self._peek_key() == 'var':
+            var_decs.append(self._compile_var_dec())
+        statements = self._compile_statements()
+        self._read('}')
+        return SubroutineNode(kind, return_type, name, parameters, var_decs, statements)
 
     def _compile_parameter_list(self):
-        self._open_tag('parameterList')
-        if self._tokenizer.peek_token().val != ')':
-            self._compile_type()
-            self._read(TokenType.IDENTIFIER)
-            while self._tokenizer.peek_token().val == ',':
+        parameters = []
+        if self._peek_key() != ')':
+            parameters.append((self._compile_type(), self._read(TokenType.IDENTIFIER)))
+            while self._peek_key() == ',':
                 self._read(',')
-                self._compile_type()
-                self._read(TokenType.IDENTIFIER)
-        self._close_tag('parameterList')
-
-    def _compile_subroutine_body(self):
-        self._open_tag('subroutineBody')
-        self._read('{')
-        while self._tokenizer.peek_token().val == 'var':
-            self._compile_var_dec()
-        self._compile_statements()
-        self._read('}')
-        self._close_tag('subroutineBody')
+                parameters.append((self._compile_type(), self._read(TokenType.IDENTIFIER)))
+        return parameters
 
     def _compile_var_dec(self):
-        self._open_tag('varDec')
         self._read('var')
-        self._compile_type()
-        self._read(TokenType.IDENTIFIER)
-        while self._tokenizer.peek_token().val == ',':
-            self._read(',')
-            self._read(TokenType.IDENTIFIER)
-        self._read(';')
-        self._close_tag('varDec')
+        var_type = self._compile_type()
+        names = self._compile_names()
+        return VarDecNode(var_type, names)
 
     def _compile_statements(self):
-        self._open_tag('statements')
-        while self._tokenizer.peek_token().val in {'let', 'if', 'while', 'do', 'return'}:
-            statement_type = self._tokenizer.peek_token().val
-            if statement_type == 'let':
-                self._compile_let_statement()
-            elif statement_type == 'if':
-                self._compile_if_statement()
-            elif statement_type == 'while':
-                self._compile_while_statement()
-            elif statement_type == 'do':
-                self._compile_do_statement()
-            elif statement_type == 'return':
-                self._compile_return_statement()
-        self._close_tag('statements')
+        statements = []
+        compile_statement = self._statement_compilers.get(self._peek_key())
+        while compile_statement is not None:
+            statements.append(compile_statement())
+            compile_statement = self._statement_compilers.get(self._peek_key())
+        return statements
+
+    def _compile_block(self):
+        self._read('{')
+        statements = self._compile_statements()
+        self._read('}')
+        return statements
 
     def _compile_let_statement(self):
-        self._open_tag('letStatement')
         self._read('let')
-        self._read(TokenType.IDENTIFIER)
-        if self._tokenizer.peek_token().val == '[':
+        name = self._read(TokenType.IDENTIFIER)
+        index = None
+        if self._peek_key() == '[':
             self._read('[')
-            self._compile_expression()
+            index = self._compile_expression()
             self._read(']')
         self._read('=')
-        self._compile_expression()
+        value = self._compile_expression()
         self._read(';')
-        self._close_tag('letStatement')
+        return LetNode(name, index, value)
 
     def _compile_if_statement(self):
-        self._open_tag('ifStatement')
         self._read('if')
         self._read('(')
-        self._compile_expression()
+        condition = self._compile_expression()
         self._read(')')
-        self._read('{')
-        self._compile_statements()
-        self._read('}')
-        if self._tokenizer.peek_token().val == 'else':
+        statements = self._compile_block()
+        else_statements = None
+        if self._peek_key() == 'else':
             self._read('else')
-            self._read('{')
-            self._compile_statements()
-            self._read('}')
-        self._close_tag('ifStatement')
+            else_statements = self._compile_block()
+        return IfNode(condition, statements, else_statements)
 
     def _compile_while_statement(self):
-        self._open_tag('whileStatement')
         self._read('while')
         self._read('(')
-        self._compile_expression()
+        condition = self._compile_expression()
         self._read(')')
-        self._read('{')
-        self._compile_statements()
-        self._read('}')
-        self._close_tag('whileStatement')
+        return WhileNode(condition, self._compile_block())
 
     def _compile_do_statement(self):
-        self._open_tag('doStatement')
         self._read('do')
-        self._compile_subroutine_call()
+        call = self._compile_subroutine_call(self._read(TokenType.IDENTIFIER))
         self._read(';')
-        self._close_tag('doStatement')
+        return DoNode(call)
 
     def _compile_return_statement(self):
-        self._open_tag('returnStatement')
         self._read('return')
-        if self._tokenizer.peek_token().val != ';':
-            self._compile_expression()
+        value = None
+        if self._peek_key() != ';':
+            value = self._compile_expression()
         self._read(';')
-        self._close_tag('returnStatement')
+        return ReturnNode(value)
 
     def _compile_expression(self):
-        self._open_tag('expression')
-        self._compile_term()
-        while self._tokenizer.peek_token().val in {'+', '-', '*', '/', '&', '|', '<', '>', '='}:
-            self._read('+', '-', '*', '/', '&', '|', '<', '>', '=')
-            self._compile_term()
-        self._close_tag('expression')
+        terms = [self._compile_term()]
+        ops = []
+        while self._peek_key() in self.binary_ops:
+            ops.append(self._read('+', '-', '*', '/', '&', '|', '<', '>', '='))
+            terms.append(self._compile_term())
+        return ExpressionNode(terms, ops)
 
     def _compile_term(self):
-        self._open_tag('term')
-        try:
-            self._read(TokenType.INTEGER, TokenType.STRING, TokenType.IDENTIFIER,
-                       'true', 'false', 'null', 'this')
-            if self._tokenizer.curr_token().token_type == TokenType.IDENTIFIER:
-                if self._tokenizer.peek_token().val == '[':
-                    self._read('[')
-                    self._compile_expression()
-                    self._read(']')
-                elif self._tokenizer.peek_token().val in {'.', '('}:
-                    self._compile_subroutine_call()
-        except SyntaxError:
-            self._tokenizer.retreat()
-            if self._tokenizer.peek_token().val == '(':
-                self._read('(')
-                self._compile_expression()
-                self._read(')')
-            else:
-                self._read('-', '~')
-                self._compile_term()
-        self._close_tag('term')
-
-    def _compile_subroutine_call(self):
-        if self._tokenizer.curr_token().token_type != TokenType.IDENTIFIER:
-            self._read(TokenType.IDENTIFIER)
-        if self._tokenizer.peek_token().val == '(':
-            self._read('(')
-            self._compile_expression_list()
-            self._read(')')
-        else:
+        compile_term = self._term_compilers.get(self._peek_key())
+        if compile_term is None:
+            raise self._error(self._tokenizer.peek_token(), self._term_compilers)
+        return compile_term()
+
+    def _compile_constant_term(self):
+        return ConstantNode(self._read(TokenType.INTEGER, TokenType.STRING, 'true', 'false', 'null', 'this'))
+
+    def _compile_identifier_term(self):
+        # the token after the identifier tells a variable, an array entry
+        # and a subroutine call apart
+        name = self._read(TokenType.IDENTIFIER)
+        next_key = self._peek_key()
+        if next_key == '[':
+            self._read('[')
+            index = self._compile_expression()
+            self._read(']')
+            return VariableNode(name, index)
+        elif next_key == '.' or next_key == '(':
+            return self._compile_subroutine_call(name)
+        return VariableNode(name, None)
+
+    def _compile_parenthesized_term(self):
+        self._read('(')
+        expression = self._compile_expression()
+        self._read(')')
+        return ParenthesizedNode(expression)
+
+    def _compile_unary_term(self):
+        op = self._read('-', '~')
+        return UnaryNode(op, self._compile_term())
+
+    def _compile_subroutine_call(self, name):
+        # name is the identifier already read, the subroutine's own or the
+        # class or variable it is called on
+        receiver = None
+        if self._peek_key() != '(':
             self._read('.')
-            self._read(TokenType.IDENTIFIER)
-            self._read('(')
-            self._compile_expression_list()
-            self._read(')')
+            receiver = name
+            name = self._read(TokenType.IDENTIFIER)
+        self._read('(')
+        arguments = self._compile_expression_list()
+        self._read(')')
+        return CallNode(receiver, name, arguments)
 
     def _compile_expression_list(self):
-        self._open_tag('expressionList')
-        if self._tokenizer.peek_token().val != ')':
-            self._compile_expression()
-            while self._tokenizer.peek_token().val == ',':
+        arguments = []
+        if self._peek_key() != ')':
+            arguments.append(self._compile_expression())
+            while self._peek_key() == ',':
                 self._read(',')
-                self._compile_expression()
-        self._close_tag('expressionList')
+                arguments.append(self._compile_expression())
+        return arguments
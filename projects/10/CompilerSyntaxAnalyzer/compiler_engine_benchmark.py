@@ -0,0 +1,45 @@
+import sys
+import os
+import glob
+import time
+
+from compiler_fast_tokenizer import CompilerFastTokenizer
+from compiler_engine import CompilerEngine
+
+
+def _jack_files(source):
+    if os.path.isfile(source):
+        return [source]
+    return sorted(glob.glob(os.path.join(source, '*.jack')))
+
+
+def benchmark(files, repeat=5):
+    # tokens are scanned up front, only the parse itself is timed
+    tokenizers = [CompilerFastTokenizer(file) for file in files]
+    tokens_num = sum(len(tokenizer._tokens) for tokenizer in tokenizers)
+
+    best = None
+    for _ in range(repeat):
+        elapsed = 0
+        for tokenizer in tokenizers:
+            tokenizer._curr_token_num = -1
+            start = time.perf_counter()
+            CompilerEngine(tokenizer, os.devnull).start()
+            elapsed += time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return tokens_num, best
+
+
+if __name__ == '__main__':
+    sources = sys.argv[1:]
+    if len(sources) == 0:
+        projects = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+        sources = [os.path.join(projects, '12'), os.path.join(projects, '11', 'Pong')]
+
+    for source in sources:
+        files = _jack_files(source)
+        tokens_num, seconds = benchmark(files)
+        print(f'{os.path.basename(os.path.abspath(source))}: {len(files)} files, {tokens_num} tokens '
+              f'in {seconds * 1000:.1f} ms, {tokens_num / seconds:,.0f} tokens/s')
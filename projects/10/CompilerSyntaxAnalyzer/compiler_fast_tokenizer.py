@@ -0,0 +1,65 @@
+import re
+
+from compiler_token import Token, TokenType
+from compiler_tokenizer import CompilerTokenizer
+
+
+class CompilerFastTokenizer(CompilerTokenizer):
+    # one match per token: white space and comments in front of it, then
+    # exactly one of the groups integer, string, word, symbol. A '/' that
+    # starts a comment is never a symbol and a line comment always runs to
+    # the line end, so no token is ever matched inside a comment, even in a
+    # part of the file that ends in the middle of one
+    token_re = re.compile(r'(?:\s|//[^\n]*(?![^\n])|/\*.*?\*/)*'
+                          r'(?:(\d+)|"([^"\n]*)"|([A-Za-z_]\w*)|([{}()\[\].,;+\-*&|<>=~]|/(?![*/])))', re.DOTALL)
+    skip_re = re.compile(r'(?:\s|//[^\n]*|/\*.*?\*/)*', re.DOTALL)
+
+    group_types = (None, TokenType.INTEGER, TokenType.STRING, None, TokenType.SYMBOL)
+
+    def _tokenize(self):
+        jack_file = open(self._file_in, 'r')
+        text = jack_file.read()
+        jack_file.close()
+
+        keywords = self.keywords
+        group_types = self.group_types
+        tokens = self._tokens
+        end = 0
+
+        # line numbers are counted up to each token from the previous one
+        line = 1
+        line_start = 0
+        counted = 0
+
+        for match in self.token_re.finditer(text):
+            # a gap between matches is a character no token starts with
+            if match.start() != end:
+                break
+            end = match.end()
+
+            group = match.lastindex
+            # a string starts at its opening quote
+            start = match.start(group) - (group == 2)
+            newlines = text.count('\n', counted, start)
+            if newlines:
+                line += newlines
+                line_start = text.rfind('\n', counted, start) + 1
+            counted = start
+
+            val = match.group(group)
+            if group == 3:
+                token_type = TokenType.KEYWORD if val in keywords else TokenType.IDENTIFIER
+            else:
+                token_type = group_types[group]
+            tokens.append(Token(val, token_type, line, start - line_start + 1))
+
+        self.check_tail(text, end)
+
+    @classmethod
+    def check_tail(cls, text, end):
+        # only white space and comments may follow the last token
+        end = cls.skip_re.match(text, end).end()
+        if end != len(text):
+            line = text.count('\n', 0, end) + 1
+            column = end - text.rfind('\n', 0, end)
+            raise SyntaxError(f'line {line}, column {column}: unexpected character {text[end]!r}')
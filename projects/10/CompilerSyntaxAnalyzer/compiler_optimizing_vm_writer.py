@@ -0,0 +1,157 @@
+from compiler_token import TokenType
+from compiler_ast import ExpressionNode, ConstantNode, UnaryNode, ParenthesizedNode
+from compiler_vm_writer import CompilerVMWriter
+
+
+def _word(value):
+    # wraps to a signed 16-bit value, as the VM arithmetic does
+    return ((value + 0x8000) & 0xFFFF) - 0x8000
+
+
+class CompilerOptimizingVMWriter(CompilerVMWriter):
+    # folds constant subexpressions and applies constant operands as
+    # cheaply as their value allows: no Math.multiply for a power of two,
+    # nothing at all for + 0 or * 1, and sub instead of add of a negative
+    keyword_values = {'true': -1, 'false': 0, 'null': 0}
+    commutative_ops = {'+', '*', '&', '|', '='}
+    inverse_ops = {'+': '-', '-': '+'}
+
+    def _constant(self, node):
+        # the value of a term or expression of constants only, else None
+        node_type = type(node)
+        if node_type is ConstantNode:
+            token = node.token
+            if token.token_type == TokenType.INTEGER:
+                return int(token.val)
+            if token.token_type == TokenType.KEYWORD:
+                return self.keyword_values.get(token.val)
+            return None
+        if node_type is UnaryNode:
+            value = self._constant(node.term)
+            if value is None:
+                return None
+            return _word(-value) if node.op.val == '-' else ~value
+        if node_type is ParenthesizedNode:
+            node = node.expression
+        elif node_type is not ExpressionNode:
+            return None
+
+        value = self._constant(node.terms[0])
+        for op, term in zip(node.ops, node.terms[1:]):
+            if value is None:
+                return None
+            operand = self._constant(term)
+            value = None if operand is None else self._fold(op.val, value, operand)
+        return value
+
+    def _fold(self, op, x, y):
+        # as the VM and the OS compute it, or None where that is an error
+        if op == '+':
+            return _word(x + y)
+        if op == '-':
+            return _word(x - y)
+        if op == '*':
+            return _word(x * y)
+        if op == '/':
+            # Math.divide rounds toward zero, and calls Sys.error for 0
+            if y == 0 or x == -0x8000 or y == -0x8000:
+                return None
+            quotient = abs(x) // abs(y)
+            return quotient if (x < 0) == (y < 0) else -quotient
+        if op == '&':
+            return x & y
+        if op == '|':
+            return x | y
+        if op == '<':
+            return -1 if x < y else 0
+        if op == '>':
+            return -1 if x > y else 0
+        return -1 if x == y else 0
+
+    def _push_value(self, value):
+        # push constant only takes 0..32767
+        if value >= 0:
+            self._push('constant', value)
+        elif value == -0x8000:
+            self._push('constant', 0x7FFF)
+            self._command('not')
+        else:
+            self._push('constant', -value)
+            self._command('neg')
+
+    def _write_double(self):
+        # a value just pushed is pushed once more, anything else is copied
+        # through temp 0, which is free while an expression is evaluated
+        last = self._lines[-1]
+        if last.startswith('push '):
+            self._command(last)
+        else:
+            self._pop('temp', 0)
+            self._push('temp', 0)
+            self._push('temp', 0)
+        self._command('add')
+
+    def _write_constant_operand(self, op, value):
+        # the left operand is on the stack
+        if op == '*':
+            if value == 0:
+                self._pop('temp', 0)
+                self._push('constant', 0)
+                return
+            magnitude = abs(value)
+            if magnitude & (magnitude - 1) == 0:
+                for _ in range(magnitude.bit_length() - 1):
+                    self._write_double()
+                if value < 0:
+                    self._command('neg')
+                return
+        elif op == '/':
+            if value == 1:
+                return
+            if value == -1:
+                self._command('neg')
+                return
+        elif op in self.inverse_ops:
+            if value == 0:
+                return
+            if value < 0 and value != -0x8000:
+                op = self.inverse_ops[op]
+                value = -value
+        self._push_value(value)
+        self._write_op(op)
+
+    def _write_expression(self, node):
+        # constants are folded for as long as they lead the expression,
+        # Jack evaluating strictly left to right
+        terms = node.terms
+        value = self._constant(terms[0])
+        if value is None:
+            self._write_term(terms[0])
+
+        for i, op in enumerate(node.ops):
+            op = op.val
+            term = terms[i + 1]
+            operand = self._constant(term)
+
+            if value is not None:
+                if operand is not None:
+                    folded = self._fold(op, value, operand)
+                    if folded is not None:
+                        value = folded
+                        continue
+                if op in self.commutative_ops and operand is None:
+                    self._write_term(term)
+                    self._write_constant_operand(op, value)
+                else:
+                    self._push_value(value)
+                    self._write_term(term)
+                    self._write_op(op)
+                value = None
+            elif operand is not None:
+                self._write_constant_operand(op, operand)
+            else:
+                self._write_term(term)
+                self._write_op(op)
+
+        if value is not None:
+            self._push_value(value)
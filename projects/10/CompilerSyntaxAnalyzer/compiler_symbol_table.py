@@ -0,0 +1,34 @@
+class CompilerSymbolTable:
+    # kind of a variable -> VM segment it lives in
+    segments = {'static': 'static', 'field': 'this', 'argument': 'argument', 'var': 'local'}
+
+    def __init__(self):
+        # name -> (segment, type, index), class scope and subroutine scope
+        self._class_symbols = {}
+        self._subroutine_symbols = {}
+        self._counts = dict.fromkeys(self.segments, 0)
+
+    def start_class(self):
+        self._class_symbols = {}
+        self._subroutine_symbols = {}
+        self._counts = dict.fromkeys(self.segments, 0)
+
+    def start_subroutine(self):
+        self._subroutine_symbols = {}
+        self._counts['argument'] = 0
+        self._counts['var'] = 0
+
+    def define(self, name, var_type, kind):
+        symbols = self._class_symbols if kind in ('static', 'field') else self._subroutine_symbols
+        symbols[name] = (self.segments[kind], var_type, self._counts[kind])
+        self._counts[kind] += 1
+
+    def var_count(self, kind):
+        return self._counts[kind]
+
+    def lookup(self, name):
+        # subroutine names shadow class names, None if neither has it
+        symbol = self._subroutine_symbols.get(name)
+        if symbol is None:
+            symbol = self._class_symbols.get(name)
+        return symbol
@@ -1,9 +1,15 @@
-import sys
 import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 
 from singleton import Singleton
-from compiler_tokenizer import CompilerTokenizer
+from compiler_fast_tokenizer import CompilerFastTokenizer
+from compiler_token_stream import CompilerTokenStream
 from compiler_engine import CompilerEngine
+import common_path
+from instrumentation import Instrumentation
 
 
 class CompilerSyntaxAnalyzer(metaclass=Singleton):
@@ -17,19 +23,74 @@ class CompilerSyntaxAnalyzer(metaclass=Singleton):
                 raise ValueError
         else:
             return [os.path.join(source, file)
-                    for file in os.listdir(source) if file.endswith('.jack')]
+                    for file in sorted(os.listdir(source)) if file.endswith('.jack')]
 
-    def analyze(self, source):
-        files_in = self._explore_source(source)
-        for file_in in files_in:
-            tokenizer = CompilerTokenizer(file_in)
+    def analyze_file(self, file_in, stream=False):
+        # returns the file, seconds taken and the error message, or None;
+        # any error, such as a file that is not UTF-8, stops this file only
+        start = time.perf_counter()
+        try:
+            tokenizer = CompilerTokenStream(file_in) if stream else CompilerFastTokenizer(file_in)
             engine = CompilerEngine(tokenizer, file_in.replace('.jack', '.xml'))
             engine.start()
+            error = None
+        except SyntaxError as e:
+            error = str(e)
+        except Exception as e:
+            error = f'{type(e).__name__}: {e}'
+        return file_in, time.perf_counter() - start, error
+
+    def analyze_files(self, files_in, stream=False, jobs=1):
+        # files are independent, in parallel if asked to, results come
+        # back in the order of files_in
+        if jobs == 1 or len(files_in) < 2:
+            return [self.analyze_file(file_in, stream) for file_in in files_in]
+
+        with ProcessPoolExecutor(jobs) as executor:
+            return list(executor.map(_analyze_file, files_in, [stream] * len(files_in)))
+
+    def analyze(self, source, stream=False, jobs=1):
+        return self.analyze_files(self._explore_source(source), stream, jobs)
+
+    @staticmethod
+    def summary(results, seconds):
+        lines = [f'{file_in}: {file_seconds * 1000:.1f} ms' + ('' if error is None else f', {error}')
+                 for file_in, file_seconds, error in results]
+        errors = sum(error is not None for _, _, error in results)
+        busy = sum(file_seconds for _, file_seconds, _ in results)
+        lines.append(f'{len(results)} files, {errors} with errors, '
+                     f'{busy * 1000:.1f} ms of work in {seconds * 1000:.1f} ms')
+        return lines
+
+
+def _analyze_file(file_in, stream):
+    return CompilerSyntaxAnalyzer().analyze_file(file_in, stream)
 
 
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print('No arguments')
+    parser = argparse.ArgumentParser()
+    parser.add_argument('sources', nargs='+', help='.jack files or directories of them')
+    parser.add_argument('--stream', action='store_true',
+                        help='scan tokens as the parser reads them instead of the whole file up front')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes for the files of all sources')
+    parser.add_argument('--summary', action='store_true', help='print the time taken for each file')
+    parser.add_argument('--instrument', metavar='FILE',
+                        help='write per-phase times and counts as JSON, phases in worker processes not included')
+    parser.add_argument('--profile', metavar='FILE', help='dump cProfile stats of the run')
+    args = parser.parse_args()
+
+    analyzer = CompilerSyntaxAnalyzer()
+    files = [file_in for arg in args.sources for file_in in analyzer._explore_source(arg)]
+    start = time.perf_counter()
+    results = Instrumentation.run(lambda: analyzer.analyze_files(files, args.stream, args.jobs),
+                                  args.instrument, args.profile)
+    seconds = time.perf_counter() - start
+
+    if args.summary:
+        print('\n'.join(analyzer.summary(results, seconds)))
     else:
-        for arg in sys.argv[1:]:
-            CompilerSyntaxAnalyzer().analyze(arg)
+        for file_in, _, error in results:
+            if error is not None:
+                print(f'{file_in}: {error}')
+    sys.exit(0 if all(error is None for _, _, error in results) else 1)
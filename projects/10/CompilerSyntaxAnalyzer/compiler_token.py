@@ -8,9 +8,16 @@ class TokenType(Enum):
     STRING = 4
     IDENTIFIER = 5
 
+    # members are singletons, so hashing them by identity is enough, and
+    # much cheaper than Enum's own __hash__ in the parser's lookups
+    __hash__ = object.__hash__
+
 
 class Token:
+    __slots__ = ('val', 'token_type', 'line', 'column')
 
-    def __init__(self, val, token_type):
+    def __init__(self, val, token_type, line=0, column=0):
         self.val = val
         self.token_type = token_type
+        self.line = line
+        self.column = column
@@ -0,0 +1,109 @@
+from collections import deque
+
+from compiler_token import Token, TokenType
+from compiler_tokenizer import CompilerTokenizer
+from compiler_fast_tokenizer import CompilerFastTokenizer
+
+
+class CompilerTokenStream:
+    # tokens are scanned from the file as the parser asks for them, only a
+    # few behind and ahead of the current one are kept, so memory does not
+    # grow with the file
+    CHUNK_SIZE = 65536
+    HISTORY = 8
+
+    token_re = CompilerFastTokenizer.token_re
+    skip_re = CompilerFastTokenizer.skip_re
+    group_types = CompilerFastTokenizer.group_types
+    keywords = CompilerTokenizer.keywords
+
+    def __init__(self, file_in):
+        self._file_in = file_in
+        self._source = self._generate_tokens()
+        # the current token is the last one of the history, tokens peeked
+        # at or stepped back over wait in ahead
+        self._history = deque(maxlen=self.HISTORY)
+        self._ahead = deque()
+
+    def _generate_tokens(self):
+        keywords = self.keywords
+        group_types = self.group_types
+        buffer = ''
+
+        # as in CompilerFastTokenizer, with offsets into the buffer, which
+        # drops what has been scanned before each chunk is added
+        line = 1
+        line_start = 0
+        counted = 0
+
+        with open(self._file_in, 'r') as jack_file:
+            while True:
+                chunk = jack_file.read(self.CHUNK_SIZE)
+                buffer += chunk
+                end = 0
+
+                for match in self.token_re.finditer(buffer):
+                    # a gap may be a comment the next chunk closes, and a
+                    # token at the very end may go on in the next chunk
+                    if match.start() != end or chunk and match.end() == len(buffer):
+                        break
+                    end = match.end()
+
+                    group = match.lastindex
+                    # a string starts at its opening quote
+                    start = match.start(group) - (group == 2)
+                    newlines = buffer.count('\n', counted, start)
+                    if newlines:
+                        line += newlines
+                        line_start = buffer.rfind('\n', counted, start) + 1
+                    counted = start
+
+                    val = match.group(group)
+                    if group == 3:
+                        token_type = TokenType.KEYWORD if val in keywords else TokenType.IDENTIFIER
+                    else:
+                        token_type = group_types[group]
+                    yield Token(val, token_type, line, start - line_start + 1)
+
+                if not chunk:
+                    end = self.skip_re.match(buffer, end).end()
+                    if end != len(buffer):
+                        newlines = buffer.count('\n', counted, end)
+                        if newlines:
+                            line += newlines
+                            line_start = buffer.rfind('\n', counted, end) + 1
+                        raise SyntaxError(f'line {line}, column {end - line_start + 1}: '
+                                          f'unexpected character {buffer[end]!r}')
+                    return
+
+                # tokens hold no newline, so none is left to count before end
+                buffer = buffer[end:]
+                counted = 0
+                line_start -= end
+
+    def curr_token(self):
+        return self._history[-1]
+
+    def peek_token(self):
+        if not self._ahead:
+            token = next(self._source, None)
+            if token is None:
+                raise IndexError
+            self._ahead.append(token)
+        return self._ahead[0]
+
+    def advance(self):
+        if self._ahead:
+            token = self._ahead.popleft()
+        else:
+            token = next(self._source, None)
+            if token is None:
+                raise SyntaxError('unexpected end of file')
+        self._history.append(token)
+        return token
+
+    def retreat(self):
+        if len(self._history) < 2:
+            raise IndexError
+        self._ahead.appendleft(self._history.pop())
+        return self.curr_token()
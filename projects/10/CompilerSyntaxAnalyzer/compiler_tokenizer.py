@@ -1,6 +1,8 @@
 from enum import Enum
 
 from compiler_token import Token, TokenType
+import common_path
+from instrumentation import Instrumentation
 
 
 class CompilerTokenizerState(Enum):
@@ -32,7 +34,15 @@ class CompilerTokenizer:
         self._curr_line = None
         self._curr_token_val = None
         self._curr_pos = None
-        self._tokenize()
+        self._curr_line_num = 0
+        # where the token being built starts
+        self._token_line = None
+        self._token_column = None
+        with Instrumentation.phase('compiler.tokenize', file_in) as phase:
+            self._tokenize()
+        if Instrumentation.enabled:
+            phase.counts['tokens'] = len(self._tokens)
+            phase.counts['lines'] = self._tokens[-1].line if self._tokens else 0
         self._curr_token_num = -1
 
     def curr_token(self):
@@ -45,7 +55,7 @@ class CompilerTokenizer:
 
     def advance(self):
         if self._curr_token_num + 1 == len(self._tokens):
-            raise SyntaxError
+            raise SyntaxError('unexpected end of file')
         self._curr_token_num += 1
         return self.curr_token()
 
@@ -72,6 +82,10 @@ class CompilerTokenizer:
                 self._parse_word_state()
             self._curr_pos += 1
 
+    def _start_token(self):
+        self._token_line = self._curr_line_num
+        self._token_column = self._curr_pos + 1
+
     def _parse_normal_state(self):
         if self._curr_line[self._curr_pos] == '/' and self._curr_line[self._curr_pos + 1] == '*':
             self._state = CompilerTokenizerState.BLOCK_COMMENT
@@ -82,18 +96,23 @@ class CompilerTokenizer:
         elif self._curr_line[self._curr_pos] == '"':
             self._state = CompilerTokenizerState.STRING
             self._curr_token_val = ''
+            self._start_token()
         elif self._is_num(self._curr_line[self._curr_pos]):
             self._state = CompilerTokenizerState.INTEGER
             self._curr_token_val = ''
+            self._start_token()
             self._curr_pos -= 1
         elif self._is_letter(self._curr_line[self._curr_pos]):
             self._state = CompilerTokenizerState.WORD
             self._curr_token_val = ''
+            self._start_token()
             self._curr_pos -= 1
         elif self._curr_line[self._curr_pos] in self.symbols:
-            self._tokens.append(Token(self._curr_line[self._curr_pos], TokenType.SYMBOL))
+            self._tokens.append(Token(self._curr_line[self._curr_pos], TokenType.SYMBOL,
+                                      self._curr_line_num, self._curr_pos + 1))
         elif not self._is_white_space(self._curr_line[self._curr_pos]):
-            raise SyntaxError
+            raise SyntaxError(f'line {self._curr_line_num}, column {self._curr_pos + 1}: '
+                              f'unexpected character {self._curr_line[self._curr_pos]!r}')
 
     def _parse_line_comment_state(self):
         if self._curr_pos == len(self._curr_line) - 1:
@@ -107,7 +126,7 @@ class CompilerTokenizer:
     def _parse_string_state(self):
         if self._curr_line[self._curr_pos] == '"':
             self._state = CompilerTokenizerState.NORMAL
-            self._tokens.append(Token(self._curr_token_val, TokenType.STRING))
+            self._tokens.append(Token(self._curr_token_val, TokenType.STRING, self._token_line, self._token_column))
         else:
             self._curr_token_val += self._curr_line[self._curr_pos]
 
@@ -116,7 +135,7 @@ class CompilerTokenizer:
             self._curr_token_val += self._curr_line[self._curr_pos]
         else:
             self._state = CompilerTokenizerState.NORMAL
-            self._tokens.append(Token(self._curr_token_val, TokenType.INTEGER))
+            self._tokens.append(Token(self._curr_token_val, TokenType.INTEGER, self._token_line, self._token_column))
             self._curr_pos -= 1
 
     def _parse_word_state(self):
@@ -124,10 +143,8 @@ class CompilerTokenizer:
             self._curr_token_val += self._curr_line[self._curr_pos]
         else:
             self._state = CompilerTokenizerState.NORMAL
-            if self._curr_token_val in self.keywords:
-                self._tokens.append(Token(self._curr_token_val, TokenType.KEYWORD))
-            else:
-                self._tokens.append(Token(self._curr_token_val, TokenType.IDENTIFIER))
+            token_type = TokenType.KEYWORD if self._curr_token_val in self.keywords else TokenType.IDENTIFIER
+            self._tokens.append(Token(self._curr_token_val, token_type, self._token_line, self._token_column))
             self._curr_pos -= 1
 
     def _is_num(self, char):
@@ -147,6 +164,7 @@ class CompilerTokenizer:
         # xml_file = open(self._file_in.replace('.jack', 'T.xml'), 'w')
 
         for line in jack_file.readlines():
+            self._curr_line_num += 1
             self._curr_line = line
             self._parse_line()
 
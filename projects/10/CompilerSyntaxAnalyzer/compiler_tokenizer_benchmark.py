@@ -0,0 +1,40 @@
+import sys
+import os
+import glob
+import time
+
+from compiler_tokenizer import CompilerTokenizer
+from compiler_fast_tokenizer import CompilerFastTokenizer
+
+
+def _jack_files(source):
+    if os.path.isfile(source):
+        return [source]
+    return sorted(glob.glob(os.path.join(source, '*.jack')))
+
+
+def benchmark(tokenizer_class, files, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tokens_num = sum(len(tokenizer_class(file)._tokens) for file in files)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return tokens_num, best
+
+
+if __name__ == '__main__':
+    sources = sys.argv[1:]
+    if len(sources) == 0:
+        projects = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+        sources = [os.path.join(projects, '12'), os.path.join(projects, '11', 'Pong')]
+
+    for source in sources:
+        files = _jack_files(source)
+        print(f'{os.path.basename(os.path.abspath(source))}: {len(files)} files')
+        for tokenizer_class in (CompilerTokenizer, CompilerFastTokenizer):
+            tokens_num, seconds = benchmark(tokenizer_class, files)
+            print(f'  {tokenizer_class.__name__}: {tokens_num} tokens in {seconds * 1000:.1f} ms, '
+                  f'{tokens_num / seconds:,.0f} tokens/s')
@@ -0,0 +1,239 @@
+from compiler_token import TokenType
+import common_path
+from instrumentation import Instrumentation
+from compiler_symbol_table import CompilerSymbolTable
+from compiler_ast import LetNode, IfNode, WhileNode, DoNode, ReturnNode, ConstantNode, VariableNode, CallNode, \
+    UnaryNode, ParenthesizedNode
+
+
+class CompilerVMWriter:
+    # compiles a class parse tree to VM code, command for command as the
+    # nand2tetris JackCompiler does, labels included
+    binary_commands = {'+': 'add', '-': 'sub', '&': 'and', '|': 'or', '<': 'lt', '>': 'gt', '=': 'eq'}
+    binary_calls = {'*': 'Math.multiply', '/': 'Math.divide'}
+    unary_commands = {'-': 'neg', '~': 'not'}
+
+    def __init__(self, file_out=None):
+        self.file_out = file_out
+        self._symbol_table = CompilerSymbolTable()
+        self._lines = []
+        self._class_name = None
+        # label numbers count up within each subroutine
+        self._if_num = 0
+        self._while_num = 0
+
+        self._statement_writers = {
+            LetNode: self._write_let_statement,
+            IfNode: self._write_if_statement,
+            WhileNode: self._write_while_statement,
+            DoNode: self._write_do_statement,
+            ReturnNode: self._write_return_statement
+        }
+        self._term_writers = {
+            ConstantNode: self._write_constant_term,
+            VariableNode: self._write_variable_term,
+            CallNode: self._write_subroutine_call,
+            UnaryNode: self._write_unary_term,
+            ParenthesizedNode: self._write_parenthesized_term
+        }
+
+    def write(self, class_node):
+        output = open(self.file_out, 'w')
+        output.write(self.generate(class_node))
+        output.close()
+
+    def generate(self, class_node):
+        # the class's VM code as one string
+        with Instrumentation.phase('compiler.vm', class_node.name.val) as phase:
+            self._lines = []
+            self._write_class(class_node)
+            code = '\n'.join(self._lines) + '\n'
+        if Instrumentation.enabled:
+            phase.counts['vm_commands'] = len(self._lines)
+        return code
+
+    def _error(self, token, message):
+        return SyntaxError(f'line {token.line}, column {token.column}: {message}')
+
+    def _command(self, command):
+        self._lines.append(command)
+
+    def _push(self, segment, index):
+        self._lines.append(f'push {segment} {index}')
+
+    def _pop(self, segment, index):
+        self._lines.append(f'pop {segment} {index}')
+
+    def _variable(self, name):
+        symbol = self._symbol_table.lookup(name.val)
+        if symbol is None:
+            raise self._error(name, f'undefined variable {name.val!r}')
+        return symbol
+
+    def _write_class(self, node):
+        self._class_name = node.name.val
+        self._symbol_table.start_class()
+        for var_dec in node.var_decs:
+            for name in var_dec.names:
+                self._symbol_table.define(name.val, var_dec.var_type.val, var_dec.kind.val)
+        for subroutine in node.subroutines:
+            self._write_subroutine(subroutine)
+
+    def _write_subroutine(self, node):
+        self._symbol_table.start_subroutine()
+        self._if_num = 0
+        self._while_num = 0
+
+        kind = node.kind.val
+        if kind == 'method':
+            self._symbol_table.define('this', self._class_name, 'argument')
+        for var_type, name in node.parameters:
+            self._symbol_table.define(name.val, var_type.val, 'argument')
+        for var_dec in node.var_decs:
+            for name in var_dec.names:
+                self._symbol_table.define(name.val, var_dec.var_type.val, 'var')
+
+        self._command(f'function {self._class_name}.{node.name.val} {self._symbol_table.var_count("var")}')
+        if kind == 'constructor':
+            self._push('constant', self._symbol_table.var_count('field'))
+            self._command('call Memory.alloc 1')
+            self._pop('pointer', 0)
+        elif kind == 'method':
+            self._push('argument', 0)
+            self._pop('pointer', 0)
+        self._write_statements(node.statements)
+
+    def _write_statements(self, statements):
+        for statement in statements:
+            self._statement_writers[type(statement)](statement)
+
+    def _write_let_statement(self, node):
+        segment, _, index = self._variable(node.name)
+        if node.index is None:
+            self._write_expression(node.value)
+            self._pop(segment, index)
+        else:
+            # the value may read other array entries and move pointer 1,
+            # so the entry's address waits on the stack until it is done
+            self._write_expression(node.index)
+            self._push(segment, index)
+            self._command('add')
+            self._write_expression(node.value)
+            self._pop('temp', 0)
+            self._pop('pointer', 1)
+            self._push('temp', 0)
+            self._pop('that', 0)
+
+    def _write_if_statement(self, node):
+        num = self._if_num
+        self._if_num += 1
+
+        self._write_expression(node.condition)
+        self._command(f'if-goto IF_TRUE{num}')
+        self._command(f'goto IF_FALSE{num}')
+        self._command(f'label IF_TRUE{num}')
+        self._write_statements(node.statements)
+        if node.else_statements is None:
+            self._command(f'label IF_FALSE{num}')
+        else:
+            self._command(f'goto IF_END{num}')
+            self._command(f'label IF_FALSE{num}')
+            self._write_statements(node.else_statements)
+            self._command(f'label IF_END{num}')
+
+    def _write_while_statement(self, node):
+        num = self._while_num
+        self._while_num += 1
+
+        self._command(f'label WHILE_EXP{num}')
+        self._write_expression(node.condition)
+        self._command('not')
+        self._command(f'if-goto WHILE_END{num}')
+        self._write_statements(node.statements)
+        self._command(f'goto WHILE_EXP{num}')
+        self._command(f'label WHILE_END{num}')
+
+    def _write_do_statement(self, node):
+        self._write_subroutine_call(node.call)
+        self._pop('temp', 0)
+
+    def _write_return_statement(self, node):
+        if node.value is None:
+            self._push('constant', 0)
+        else:
+            self._write_expression(node.value)
+        self._command('return')
+
+    def _write_expression(self, node):
+        # Jack has no operator precedence, terms are applied left to right
+        terms = node.terms
+        self._write_term(terms[0])
+        for i, op in enumerate(node.ops):
+            self._write_term(terms[i + 1])
+            self._write_op(op.val)
+
+    def _write_op(self, op):
+        if op in self.binary_calls:
+            self._command(f'call {self.binary_calls[op]} 2')
+        else:
+            self._command(self.binary_commands[op])
+
+    def _write_term(self, node):
+        self._term_writers[type(node)](node)
+
+    def _write_constant_term(self, node):
+        token = node.token
+        if token.token_type == TokenType.INTEGER:
+            self._push('constant', token.val)
+        elif token.token_type == TokenType.STRING:
+            self._push('constant', len(token.val))
+            self._command('call String.new 1')
+            for char in token.val:
+                self._push('constant', ord(char))
+                self._command('call String.appendChar 2')
+        elif token.val == 'this':
+            self._push('pointer', 0)
+        else:
+            self._push('constant', 0)
+            if token.val == 'true':
+                self._command('not')
+
+    def _write_variable_term(self, node):
+        segment, _, index = self._variable(node.name)
+        if node.index is None:
+            self._push(segment, index)
+        else:
+            self._write_expression(node.index)
+            self._push(segment, index)
+            self._command('add')
+            self._pop('pointer', 1)
+            self._push('that', 0)
+
+    def _write_unary_term(self, node):
+        self._write_term(node.term)
+        self._command(self.unary_commands[node.op.val])
+
+    def _write_parenthesized_term(self, node):
+        self._write_expression(node.expression)
+
+    def _write_subroutine_call(self, node):
+        # a method gets the object it is called on as its first argument
+        receiver = node.receiver
+        if receiver is None:
+            self._push('pointer', 0)
+            name = f'{self._class_name}.{node.name.val}'
+            args_num = len(node.arguments) + 1
+        else:
+            symbol = self._symbol_table.lookup(receiver.val)
+            if symbol is None:
+                name = f'{receiver.val}.{node.name.val}'
+                args_num = len(node.arguments)
+            else:
+                segment, var_type, index = symbol
+                self._push(segment, index)
+                name = f'{var_type}.{node.name.val}'
+                args_num = len(node.arguments) + 1
+
+        for argument in node.arguments:
+            self._write_expression(argument)
+        self._command(f'call {name} {args_num}')
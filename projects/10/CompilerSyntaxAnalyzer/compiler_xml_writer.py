@@ -0,0 +1,222 @@
+from compiler_tokenizer import CompilerTokenizer
+from compiler_token import TokenType
+from compiler_ast import LetNode, IfNode, WhileNode, DoNode, ReturnNode, ConstantNode, VariableNode, CallNode, \
+    UnaryNode, ParenthesizedNode
+import common_path
+from instrumentation import Instrumentation
+
+
+class CompilerXMLWriter:
+    # writes a class parse tree as the XML of the nand2tetris syntax analyzer,
+    # putting back the keywords and symbols the tree leaves out
+
+    def __init__(self, file_out):
+        self.file_out = file_out
+        self.output = None
+        self._token_tags = {}
+
+        self._statement_writers = {
+            LetNode: self._write_let_statement,
+            IfNode: self._write_if_statement,
+            WhileNode: self._write_while_statement,
+            DoNode: self._write_do_statement,
+            ReturnNode: self._write_return_statement
+        }
+        self._term_writers = {
+            ConstantNode: self._write_constant_term,
+            VariableNode: self._write_variable_term,
+            CallNode: self._write_subroutine_call,
+            UnaryNode: self._write_unary_term,
+            ParenthesizedNode: self._write_parenthesized_term
+        }
+
+    def write(self, class_node):
+        with Instrumentation.phase('compiler.xml', self.file_out):
+            self.output = open(self.file_out, 'w')
+            self._write_class(class_node)
+            self.output.close()
+
+    def _open_tag(self, tag):
+        self.output.write(f'<{tag}>\n')
+
+    def _close_tag(self, tag):
+        self.output.write(f'</{tag}>\n')
+
+    def _write_tag(self, token_type, val):
+        # the same few names and symbols make up most of a file, so each
+        # distinct token's XML line is built once
+        key = (token_type, val)
+        line = self._token_tags.get(key)
+        if line is None:
+            tag = CompilerTokenizer.token_type_str[token_type]
+            val = val.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('"', '&quot;')
+            line = self._token_tags[key] = f'<{tag}>{val}</{tag}>\n'
+        self.output.write(line)
+
+    def _write_token_tag(self, token):
+        self._write_tag(token.token_type, token.val)
+
+    def _write_keyword(self, val):
+        self._write_tag(TokenType.KEYWORD, val)
+
+    def _write_symbol(self, val):
+        self._write_tag(TokenType.SYMBOL, val)
+
+    def _write_class(self, node):
+        self._open_tag('class')
+        self._write_keyword('class')
+        self._write_token_tag(node.name)
+        self._write_symbol('{')
+        for var_dec in node.var_decs:
+            self._open_tag('classVarDec')
+            self._write_token_tag(var_dec.kind)
+            self._write_token_tag(var_dec.var_type)
+            self._write_names(var_dec.names)
+            self._close_tag('classVarDec')
+        for subroutine in node.subroutines:
+            self._write_subroutine_dec(subroutine)
+        self._write_symbol('}')
+        self._close_tag('class')
+
+    def _write_names(self, names):
+        self._write_token_tag(names[0])
+        for name in names[1:]:
+            self._write_symbol(',')
+            self._write_token_tag(name)
+        self._write_symbol(';')
+
+    def _write_subroutine_dec(self, node):
+        self._open_tag('subroutineDec')
+        self._write_token_tag(node.kind)
+        self._write_token_tag(node.return_type)
+        self._write_token_tag(node.name)
+        self._write_symbol('(')
+
+        self._open_tag('parameterList')
+        for i, (var_type, name) in enumerate(node.parameters):
+            if i:
+                self._write_symbol(',')
+            self._write_token_tag(var_type)
+            self._write_token_tag(name)
+        self._close_tag('parameterList')
+        self._write_symbol(')')
+
+        self._open_tag('subroutineBody')
+        self._write_symbol('{')
+        for var_dec in node.var_decs:
+            self._open_tag('varDec')
+            self._write_keyword('var')
+            self._write_token_tag(var_dec.var_type)
+            self._write_names(var_dec.names)
+            self._close_tag('varDec')
+        self._write_statements(node.statements)
+        self._write_symbol('}')
+        self._close_tag('subroutineBody')
+        self._close_tag('subroutineDec')
+
+    def _write_statements(self, statements):
+        self._open_tag('statements')
+        for statement in statements:
+            self._statement_writers[type(statement)](statement)
+        self._close_tag('statements')
+
+    def _write_block(self, statements):
+        self._write_symbol('{')
+        self._write_statements(statements)
+        self._write_symbol('}')
+
+    def _write_let_statement(self, node):
+        self._open_tag('letStatement')
+        self._write_keyword('let')
+        self._write_token_tag(node.name)
+        if node.index is not None:
+            self._write_symbol('[')
+            self._write_expression(node.index)
+            self._write_symbol(']')
+        self._write_symbol('=')
+        self._write_expression(node.value)
+        self._write_symbol(';')
+        self._close_tag('letStatement')
+
+    def _write_if_statement(self, node):
+        self._open_tag('ifStatement')
+        self._write_keyword('if')
+        self._write_symbol('(')
+        self._write_expression(node.condition)
+        self._write_symbol(')')
+        self._write_block(node.statements)
+        if node.else_statements is not None:
+            self._write_keyword('else')
+            self._write_block(node.else_statements)
+        self._close_tag('ifStatement')
+
+    def _write_while_statement(self, node):
+        self._open_tag('whileStatement')
+        self._write_keyword('while')
+        self._write_symbol('(')
+        self._write_expression(node.condition)
+        self._write_symbol(')')
+        self._write_block(node.statements)
+        self._close_tag('whileStatement')
+
+    def _write_do_statement(self, node):
+        self._open_tag('doStatement')
+        self._write_keyword('do')
+        self._write_subroutine_call(node.call)
+        self._write_symbol(';')
+        self._close_tag('doStatement')
+
+    def _write_return_statement(self, node):
+        self._open_tag('returnStatement')
+        self._write_keyword('return')
+        if node.value is not None:
+            self._write_expression(node.value)
+        self._write_symbol(';')
+        self._close_tag('returnStatement')
+
+    def _write_expression(self, node):
+        self._open_tag('expression')
+        self._write_term(node.terms[0])
+        for op, term in zip(node.ops, node.terms[1:]):
+            self._write_token_tag(op)
+            self._write_term(term)
+        self._close_tag('expression')
+
+    def _write_term(self, node):
+        self._open_tag('term')
+        self._term_writers[type(node)](node)
+        self._close_tag('term')
+
+    def _write_constant_term(self, node):
+        self._write_token_tag(node.token)
+
+    def _write_variable_term(self, node):
+        self._write_token_tag(node.name)
+        if node.index is not None:
+            self._write_symbol('[')
+            self._write_expression(node.index)
+            self._write_symbol(']')
+
+    def _write_unary_term(self, node):
+        self._write_token_tag(node.op)
+        self._write_term(node.term)
+
+    def _write_parenthesized_term(self, node):
+        self._write_symbol('(')
+        self._write_expression(node.expression)
+        self._write_symbol(')')
+
+    def _write_subroutine_call(self, node):
+        if node.receiver is not None:
+            self._write_token_tag(node.receiver)
+            self._write_symbol('.')
+        self._write_token_tag(node.name)
+        self._write_symbol('(')
+
+        self._open_tag('expressionList')
+        for i, argument in enumerate(node.arguments):
+            if i:
+                self._write_symbol(',')
+            self._write_expression(argument)
+        self._close_tag('expressionList')
+        self._write_symbol(')')
@@ -0,0 +1,60 @@
+import os
+import argparse
+
+from singleton import Singleton
+from compiler_fast_tokenizer import CompilerFastTokenizer
+from compiler_token_stream import CompilerTokenStream
+from compiler_engine import CompilerEngine
+from compiler_vm_writer import CompilerVMWriter
+from compiler_optimizing_vm_writer import CompilerOptimizingVMWriter
+import common_path
+from instrumentation import Instrumentation
+
+
+class JackCompiler(metaclass=Singleton):
+
+    def _explore_source(self, source):
+
+        if os.path.isfile(source):
+            if source.endswith('.jack'):
+                return [source]
+            else:
+                raise ValueError
+        else:
+            return [os.path.join(source, file)
+                    for file in os.listdir(source) if file.endswith('.jack')]
+
+    def generate_file(self, file_in, stream=False, optimize=False):
+        # the file's VM code as one string
+        tokenizer = CompilerTokenStream(file_in) if stream else CompilerFastTokenizer(file_in)
+        class_node = CompilerEngine(tokenizer).parse()
+        writer_class = CompilerOptimizingVMWriter if optimize else CompilerVMWriter
+        return writer_class().generate(class_node)
+
+    def compile_file(self, file_in, stream=False, optimize=False):
+        vm_code = self.generate_file(file_in, stream, optimize)
+        vm_file = open(file_in.replace('.jack', '.vm'), 'w')
+        vm_file.write(vm_code)
+        vm_file.close()
+
+    def compile(self, source, stream=False, optimize=False):
+        for file_in in self._explore_source(source):
+            self.compile_file(file_in, stream, optimize)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='compile .jack files to .vm files next to them')
+    parser.add_argument('sources', nargs='+', help='.jack files or directories of them')
+    parser.add_argument('--stream', action='store_true',
+                        help='scan tokens as the parser reads them instead of the whole file up front')
+    parser.add_argument('-O', '--optimize', action='store_true',
+                        help='fold constant expressions and multiply by powers of two with add')
+    parser.add_argument('--instrument', metavar='FILE', help='write per-phase times and counts as JSON')
+    parser.add_argument('--profile', metavar='FILE', help='dump cProfile stats of the run')
+    args = parser.parse_args()
+
+    def compile_sources():
+        for arg in args.sources:
+            JackCompiler().compile(arg, args.stream, args.optimize)
+
+    Instrumentation.run(compile_sources, args.instrument, args.profile)
@@ -0,0 +1,256 @@
+import os
+import re
+import sys
+import glob
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+
+from toolchain_build import PROJECTS_DIR
+
+from compiler_fast_tokenizer import CompilerFastTokenizer
+from jack_compiler import JackCompiler
+import compiler_tokenizer_benchmark
+import compiler_engine_benchmark
+import vm_translator_benchmark
+import assembler_benchmark
+
+TOOLS_DIR = os.path.join(PROJECTS_DIR, '..', 'tools')
+
+# the samples that come with the projects, by the kind of source they are
+CORPORA = {
+    'jack': {
+        '10': [os.path.join(PROJECTS_DIR, '10', name) for name in ('ArrayTest', 'ExpressionLessSquare', 'Square')],
+        '11': sorted(glob.glob(os.path.join(PROJECTS_DIR, '11', '*', ''))),
+        '12': [os.path.join(PROJECTS_DIR, '12')]
+    },
+    'vm': {
+        # each test program is a directory of .vm files
+        '07': sorted({os.path.dirname(file) for file in glob.glob(os.path.join(PROJECTS_DIR, '07', '*', '*', '*.vm'))}),
+        '08': sorted({os.path.dirname(file) for file in glob.glob(os.path.join(PROJECTS_DIR, '08', '*', '*', '*.vm'))}),
+        'OS': [os.path.join(TOOLS_DIR, 'OS')]
+    },
+    'asm': {
+        '06': sorted(glob.glob(os.path.join(PROJECTS_DIR, '06', '*', '*.asm')))
+    }
+}
+
+# small programs that are copied 10 to 1000 times for the scaled runs
+SYNTHETIC_BASES = {
+    'jack': os.path.join(PROJECTS_DIR, '11', 'Square'),
+    'vm': os.path.join(PROJECTS_DIR, '08', 'FunctionCalls', 'FibonacciElement'),
+    'asm': os.path.join(PROJECTS_DIR, '06', 'rect', 'Rect.asm')
+}
+SCALES = [10, 100, 1000]
+# runs shorter than this are reported but too noisy to fail a comparison
+MIN_SECONDS = 0.01
+
+
+def _jack_files(sources):
+    files = []
+    for source in sources:
+        files += [source] if os.path.isfile(source) else sorted(glob.glob(os.path.join(source, '*.jack')))
+    return files
+
+
+def _benchmark_tokenize(sources, repeat):
+    return compiler_tokenizer_benchmark.benchmark(CompilerFastTokenizer, _jack_files(sources), repeat)
+
+
+def _benchmark_parse(sources, repeat):
+    return compiler_engine_benchmark.benchmark(_jack_files(sources), repeat)
+
+
+def _benchmark_compile(sources, repeat):
+    # tokens per second of the whole .jack to .vm compiler
+    files = _jack_files(sources)
+    tokens_num, _ = compiler_tokenizer_benchmark.benchmark(CompilerFastTokenizer, files, 1)
+
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for file in files:
+            JackCompiler().generate_file(file)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return tokens_num, best
+
+
+def _benchmark_each(benchmark, sources, repeat):
+    # sums a one-source benchmark over the sources
+    units_num = 0
+    seconds = 0
+    for source in sources:
+        source_units, source_seconds = benchmark(source, repeat)
+        units_num += source_units
+        seconds += source_seconds
+    return units_num, seconds
+
+
+def _benchmark_translate(sources, repeat):
+    return _benchmark_each(vm_translator_benchmark.benchmark, sources, repeat)
+
+
+def _benchmark_assemble(sources, repeat):
+    return _benchmark_each(assembler_benchmark.benchmark, sources, repeat)
+
+
+# stage -> kind of source, what is counted, benchmark
+STAGES = {
+    'tokenize': ('jack', 'tokens', _benchmark_tokenize),
+    'parse': ('jack', 'tokens', _benchmark_parse),
+    'compile': ('jack', 'tokens', _benchmark_compile),
+    'translate': ('vm', 'lines', _benchmark_translate),
+    'assemble': ('asm', 'lines', _benchmark_assemble)
+}
+
+
+def _scale_jack(base, scale, directory):
+    # copies of the program with their classes renamed, so the copies are
+    # still a valid program
+    files = _jack_files([base])
+    classes = [os.path.splitext(os.path.basename(file))[0] for file in files]
+    class_name = re.compile(r'\b(' + '|'.join(classes) + r')\b')
+    for file in files:
+        source_file = open(file)
+        source = source_file.read()
+        source_file.close()
+        name = os.path.splitext(os.path.basename(file))[0]
+        for i in range(scale):
+            output = open(os.path.join(directory, f'{name}{i}.jack'), 'w')
+            output.write(class_name.sub(lambda match: f'{match.group(1)}{i}', source))
+            output.close()
+    return [directory]
+
+
+def _scale_vm(base, scale, directory):
+    # copies of the program's files with their function names renamed,
+    # linked as one program
+    for file in sorted(glob.glob(os.path.join(base, '*.vm'))):
+        source_file = open(file)
+        source = source_file.readlines()
+        source_file.close()
+        name = os.path.splitext(os.path.basename(file))[0]
+        for i in range(scale):
+            output = open(os.path.join(directory, f'{name}{i}.vm'), 'w')
+            for line in source:
+                words = line.split('//')[0].split()
+                if words and words[0] in ('function', 'call'):
+                    class_name, _, function_name = words[1].partition('.')
+                    words[1] = f'{class_name}{i}.{function_name}'
+                output.write(' '.join(words) + '\n')
+            output.close()
+    return [directory]
+
+
+def _scale_asm(base, scale, directory):
+    # the program's code repeated with its labels renamed in each copy,
+    # variables shared
+    source_file = open(base)
+    source = [line.split('//')[0].strip() for line in source_file]
+    source_file.close()
+    labels = {line[1:-1] for line in source if line.startswith('(')}
+
+    file_out = os.path.join(directory, os.path.basename(base))
+    output = open(file_out, 'w')
+    for i in range(scale):
+        for line in source:
+            if line.startswith('('):
+                line = f'({line[1:-1]}.{i})'
+            elif line.startswith('@') and line[1:] in labels:
+                line = f'{line}.{i}'
+            output.write(line + '\n')
+    output.close()
+    return [file_out]
+
+
+SCALERS = {'jack': _scale_jack, 'vm': _scale_vm, 'asm': _scale_asm}
+
+
+def run(stages=tuple(STAGES), scales=SCALES, repeat=5):
+    # times each stage on the corpora and on scaled copies of the synthetic
+    # bases; the best of repeat runs is kept
+    results = {}
+
+    def add(stage, corpus, scale, sources):
+        kind, unit, benchmark = STAGES[stage]
+        units_num, seconds = benchmark(sources, repeat)
+        key = f'{stage}/{corpus}' + (f' x{scale}' if scale > 1 else '')
+        results[key] = {'stage': stage, 'corpus': corpus, 'scale': scale, 'unit': unit, 'units': units_num,
+                        'seconds': seconds, 'rate': units_num / seconds}
+        print(f'{key}: {units_num} {unit} in {seconds * 1000:.1f} ms, {units_num / seconds:,.0f} {unit}/s',
+              flush=True)
+
+    for stage in stages:
+        kind = STAGES[stage][0]
+        for corpus, sources in CORPORA[kind].items():
+            add(stage, corpus, 1, sources)
+
+        base = SYNTHETIC_BASES[kind]
+        corpus = os.path.basename(os.path.normpath(base))
+        for scale in scales:
+            tmp_dir = tempfile.mkdtemp()
+            try:
+                add(stage, corpus, scale, SCALERS[kind](base, scale, tmp_dir))
+            finally:
+                shutil.rmtree(tmp_dir)
+
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'repeat': repeat,
+        'results': results
+    }
+
+
+def compare(baseline, report, threshold):
+    # (lines, regressed): each result's rate against the baseline's, a
+    # regression being a drop of more than threshold in runs long enough
+    # to tell
+    lines = []
+    regressed = False
+    for key, result in report['results'].items():
+        old = baseline['results'].get(key)
+        if old is None:
+            continue
+        change = result['rate'] / old['rate'] - 1
+        slower = change < -threshold and min(result['seconds'], old['seconds']) >= MIN_SECONDS
+        regressed = regressed or slower
+        lines.append(f'{key}: {old["rate"]:,.0f} -> {result["rate"]:,.0f} {result["unit"]}/s ({change:+.1%})' +
+                     (' REGRESSION' if slower else ''))
+    return lines, regressed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='time each stage of the toolchain on the sample programs '
+                                                 'and on scaled synthetic ones')
+    parser.add_argument('--stages', nargs='+', choices=list(STAGES), default=list(STAGES))
+    parser.add_argument('--scales', nargs='*', type=int, default=SCALES,
+                        help='times the synthetic programs are copied, none to skip them')
+    parser.add_argument('--repeat', type=int, default=5, help='runs of each benchmark, the best is kept')
+    parser.add_argument('--json', metavar='FILE', help='write the results as JSON')
+    parser.add_argument('--baseline', metavar='FILE', help='results of an earlier --json run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='fraction a rate may drop below the baseline\'s before the run fails')
+    args = parser.parse_args()
+
+    report = run(args.stages, args.scales, args.repeat)
+
+    if args.json is not None:
+        output = open(args.json, 'w')
+        json.dump(report, output, indent=2)
+        output.close()
+
+    if args.baseline is not None:
+        baseline_file = open(args.baseline)
+        baseline = json.load(baseline_file)
+        baseline_file.close()
+        lines, regressed = compare(baseline, report, args.threshold)
+        print('\n'.join(lines))
+        if regressed:
+            sys.exit(1)
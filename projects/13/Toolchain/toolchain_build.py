@@ -0,0 +1,233 @@
+import os
+import sys
+import glob
+import hashlib
+import argparse
+
+# each stage lives in the directory of the project that built it
+PROJECTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+STAGE_DIRS = {
+    'jack': os.path.join(PROJECTS_DIR, '10', 'CompilerSyntaxAnalyzer'),
+    'vm': os.path.join(PROJECTS_DIR, '08', 'VMTranslator'),
+    'asm': os.path.join(PROJECTS_DIR, '06', 'Assembler')
+}
+# and the modules they share, in a directory of their own
+COMMON_DIR = os.path.join(PROJECTS_DIR, 'common')
+for _stage_dir in [*STAGE_DIRS.values(), COMMON_DIR]:
+    if _stage_dir not in sys.path:
+        sys.path.append(_stage_dir)
+
+from jack_compiler import JackCompiler
+from vm_translator import VMTranslator
+from peephole_optimizer import PeepholeOptimizer
+from call_graph import CallGraph
+from assembler import Assembler
+from toolchain_cache import ToolchainCache
+from instrumentation import Instrumentation
+
+
+def _tool_versions():
+    # a stage's version is a hash of its sources, so editing a tool
+    # invalidates what it built and nothing else
+    versions = {}
+    for stage, stage_dir in STAGE_DIRS.items():
+        digest = hashlib.sha256()
+        for source in sorted(glob.glob(os.path.join(stage_dir, '*.py'))):
+            source_file = open(source, 'rb')
+            digest.update(source_file.read())
+            source_file.close()
+        versions[stage] = digest.hexdigest()
+    return versions
+
+
+class ToolchainBuild:
+    # .jack -> .vm -> .asm -> .hack for one program directory. Each class
+    # and each .vm file is an artifact of its own, the link and the
+    # assembly are artifacts of all of them, so an edit to one class
+    # recompiles that class and relinks
+    OS_DIR = os.path.join(PROJECTS_DIR, '..', 'tools', 'OS')
+    versions = None
+
+    def __init__(self, cache=None, os_dir=OS_DIR, optimize_jack=False, optimize=False, compact=False,
+                 comments=True, drop_unreachable=False):
+        if ToolchainBuild.versions is None:
+            ToolchainBuild.versions = _tool_versions()
+
+        self.cache = cache
+        self._os_dir = os_dir
+        self._optimize_jack = optimize_jack
+        self._optimize = optimize
+        self._compact = compact
+        self._comments = comments
+        self._drop_unreachable = drop_unreachable
+
+    def _get(self, key, build):
+        if self.cache is None:
+            return build()
+        return self.cache.get(key, build)
+
+    @staticmethod
+    def _read(file_in):
+        in_file = open(file_in, 'rb')
+        data = in_file.read()
+        in_file.close()
+        return data
+
+    @staticmethod
+    def _write(file_out, text):
+        # an output that did not change is left alone, with its mtime
+        if os.path.exists(file_out):
+            out_file = open(file_out, 'r')
+            same = out_file.read() == text
+            out_file.close()
+            if same:
+                return
+        out_file = open(file_out, 'w')
+        out_file.write(text)
+        out_file.close()
+
+    def _explore_source(self, source):
+        abs_source = os.path.abspath(source)
+
+        if os.path.isfile(source):
+            if source.endswith('.jack'):
+                return [source], os.path.dirname(abs_source), os.path.splitext(os.path.basename(source))[0]
+            else:
+                raise ValueError(f'{source}: not a .jack file')
+        # a mistyped directory would otherwise build the OS on its own
+        if not os.path.isdir(source):
+            raise FileNotFoundError(f'{source}: no such .jack file or program directory')
+        return sorted(glob.glob(os.path.join(source, '*.jack'))), source, os.path.basename(abs_source)
+
+    def compile_jack(self, file_in):
+        key = ToolchainCache.key('jack', self.versions['jack'], self._optimize_jack, self._read(file_in))
+        vm_code = self._get(key, lambda: JackCompiler().generate_file(file_in, optimize=self._optimize_jack))
+        file_out = file_in[:-len('.jack')] + '.vm'
+        self._write(file_out, vm_code)
+        return file_out
+
+    def _vm_files(self, source, directory, jack_vm_files):
+        # a single .jack file is a program of its own, a directory is all
+        # of its .vm files; OS classes the program does not define are
+        # linked in from os_dir
+        if os.path.isfile(source):
+            files = list(jack_vm_files)
+        else:
+            files = sorted(glob.glob(os.path.join(directory, '*.vm')))
+        if self._os_dir is not None:
+            names = {os.path.basename(file) for file in files}
+            files += [file for file in glob.glob(os.path.join(self._os_dir, '*.vm'))
+                      if os.path.basename(file) not in names]
+        # linked in file name order, as VMTranslator does for a directory
+        return sorted(files, key=os.path.basename)
+
+    def translate_vm(self, file_in, functions=None):
+        # functions the translator keeps from this file are part of the key
+        file_name = os.path.basename(file_in)
+        kept = '' if functions is None else ' '.join(sorted(functions))
+        key = ToolchainCache.key('vm', self.versions['vm'], file_name, self._compact, self._comments, kept,
+                                 self._read(file_in))
+
+        def build():
+            code, shared_used = VMTranslator().translate_file(file_in, self._compact, self._comments, functions)
+            return [code, sorted(shared_used)]
+
+        code, shared_used = self._get(key, build)
+        return key, (code, set(shared_used))
+
+    def link(self, parts, part_keys):
+        bootstrap = len(parts) > 1
+        key = ToolchainCache.key('link', self.versions['vm'], bootstrap, self._optimize, self._compact,
+                                 self._comments, *part_keys)
+
+        def build():
+            optimizer = PeepholeOptimizer() if self._optimize else None
+            return VMTranslator().link(parts, bootstrap, optimizer, self._compact, self._comments)
+
+        return self._get(key, build)
+
+    def assemble(self, asm_code):
+        key = ToolchainCache.key('asm', self.versions['asm'], asm_code)
+
+        def build():
+            assembler = Assembler()
+            with Instrumentation.phase('assembler.labels') as phase:
+                source = Instrumentation.counted(asm_code.splitlines(), phase, 'lines')
+                lines = assembler.delete_comments_and_labels(source)
+            with Instrumentation.phase('assembler.encode') as phase:
+                lines = assembler.translate_lines(lines)
+            if Instrumentation.enabled:
+                phase.counts['instructions'] = len(lines)
+            return ''.join(line + '\n' for line in lines)
+
+        return self._get(key, build)
+
+    def build(self, source):
+        # returns the .hack file written; the stages time their own phases,
+        # artifacts taken from the cache show up in none of them
+        with Instrumentation.phase('toolchain.build', source):
+            return self._build(source)
+
+    def _build(self, source):
+        jack_files, directory, name = self._explore_source(source)
+        jack_vm_files = [self.compile_jack(file_in) for file_in in jack_files]
+        vm_files = self._vm_files(source, directory, jack_vm_files)
+
+        # with the call graph, each file keeps its reachable functions only
+        file_functions = [None] * len(vm_files)
+        if self._drop_unreachable:
+            call_graph = CallGraph()
+            for file_in in vm_files:
+                call_graph.add_file(file_in)
+            reachable = call_graph.reachable()
+            if reachable is not None:
+                file_functions = [{function for function in reachable
+                                   if call_graph.functions[function][0] == os.path.basename(file_in)}
+                                  for file_in in vm_files]
+
+        part_keys = []
+        parts = []
+        for file_in, functions in zip(vm_files, file_functions):
+            part_key, part = self.translate_vm(file_in, functions)
+            part_keys.append(part_key)
+            parts.append(part)
+
+        asm_code = self.link(parts, part_keys)
+        asm_file = os.path.join(directory, name + '.asm')
+        self._write(asm_file, asm_code)
+
+        hack_file = os.path.join(directory, name + '.hack')
+        self._write(hack_file, self.assemble(asm_code))
+        return hack_file
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='build .jack programs down to .hack, reusing unchanged artifacts')
+    parser.add_argument('sources', nargs='+', help='program directories, or single .jack files')
+    parser.add_argument('--cache', metavar='DIR', help='directory of the build cache, none by default')
+    parser.add_argument('--cache-size', type=int, default=ToolchainCache.MAX_BYTES // (1024 * 1024), metavar='MB',
+                        help='size the cache is trimmed to, least recently used entries first')
+    parser.add_argument('--os', default=ToolchainBuild.OS_DIR, help='directory of the OS .vm files')
+    parser.add_argument('--no-os', dest='os', action='store_const', const=None, help='do not link in the OS')
+    parser.add_argument('--optimize-jack', action='store_true', help='fold constants in the Jack compiler')
+    parser.add_argument('-O', '--optimize', action='store_true', help='run the peephole optimizer on the .asm')
+    parser.add_argument('--compact', action='store_true', help='share call, return and compare routines')
+    parser.add_argument('--no-comments', dest='comments', action='store_false',
+                        help='do not echo each VM command as a comment')
+    parser.add_argument('--drop-unreachable', action='store_true',
+                        help='leave out functions not reachable from Sys.init')
+    parser.add_argument('--instrument', metavar='FILE', help='write per-phase times and counts as JSON')
+    parser.add_argument('--profile', metavar='FILE', help='dump cProfile stats of the run')
+    args = parser.parse_args()
+
+    cache = None if args.cache is None else ToolchainCache(args.cache, args.cache_size * 1024 * 1024)
+    toolchain = ToolchainBuild(cache, args.os, args.optimize_jack, args.optimize, args.compact, args.comments,
+                               args.drop_unreachable)
+
+    def build_sources():
+        for arg in args.sources:
+            print(toolchain.build(arg))
+
+    Instrumentation.run(build_sources, args.instrument, args.profile)
+    if cache is not None:
+        print(cache.summary())
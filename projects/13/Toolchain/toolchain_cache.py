@@ -0,0 +1,122 @@
+import os
+import json
+import time
+import hashlib
+
+
+class ToolchainCache:
+    # content addressed store of build artifacts, one JSON file per key.
+    # A key hashes everything a stage's output depends on, so an entry is
+    # never stale, only unused; once the directory grows past max_bytes the
+    # least recently used entries go first
+    MAX_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, cache_dir, max_bytes=MAX_BYTES):
+        self._cache_dir = cache_dir
+        self._max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # entry path -> size, read from the directory once it is needed
+        self._sizes = None
+
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'seconds_saved': 0.0
+        }
+
+    @staticmethod
+    def key(*parts):
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part if isinstance(part, bytes) else str(part).encode())
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self._cache_dir, key[:2], key + '.json')
+
+    def load(self, key):
+        # the stored value, or None
+        path = self._path(key)
+        try:
+            entry_file = open(path)
+        except FileNotFoundError:
+            return None
+
+        try:
+            entry = json.load(entry_file)
+        except ValueError:
+            return None
+        finally:
+            entry_file.close()
+
+        # the modification time is the entry's last use
+        os.utime(path)
+        self.stats['hits'] += 1
+        self.stats['seconds_saved'] += entry['seconds']
+        return entry['value']
+
+    def store(self, key, value, seconds):
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        entry_file = open(tmp_path, 'w')
+        json.dump({'seconds': seconds, 'value': value}, entry_file)
+        entry_file.close()
+
+        # concurrent writers of one key produce the same content
+        os.replace(tmp_path, path)
+        self.stats['misses'] += 1
+
+        self._scan()
+        self._sizes[path] = os.path.getsize(path)
+        self._evict()
+
+    def get(self, key, build):
+        # the stored value, or build()'s, which is stored for next time
+        value = self.load(key)
+        if value is None:
+            start = time.perf_counter()
+            value = build()
+            self.store(key, value, time.perf_counter() - start)
+        return value
+
+    def _scan(self):
+        if self._sizes is not None:
+            return
+        self._sizes = {}
+        for directory in os.scandir(self._cache_dir):
+            if directory.is_dir():
+                for entry in os.scandir(directory.path):
+                    if entry.name.endswith('.json'):
+                        self._sizes[entry.path] = entry.stat().st_size
+
+    def _evict(self):
+        total = sum(self._sizes.values())
+        if total <= self._max_bytes:
+            return
+
+        by_use = []
+        for path in self._sizes:
+            try:
+                by_use.append((os.path.getmtime(path), path))
+            except FileNotFoundError:
+                by_use.append((0, path))
+        by_use.sort()
+
+        for _, path in by_use:
+            if total <= self._max_bytes:
+                break
+            total -= self._sizes.pop(path)
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.stats['evictions'] += 1
+
+    def summary(self):
+        return (f'cache: {self.stats["hits"]} hits, {self.stats["misses"]} misses, '
+                f'{self.stats["evictions"]} evicted; {self.stats["seconds_saved"] * 1000:.1f} ms saved')
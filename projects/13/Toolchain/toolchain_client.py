@@ -0,0 +1,40 @@
+import os
+import sys
+import json
+import socket
+import argparse
+
+
+def request(socket_path, source):
+    # asks a running toolchain_daemon.py to build source, returns its reply
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(socket_path)
+    try:
+        client.sendall(json.dumps({'source': os.path.abspath(source)}).encode() + b'\n')
+        reply = b''
+        while not reply.endswith(b'\n'):
+            data = client.recv(65536)
+            if not data:
+                break
+            reply += data
+    finally:
+        client.close()
+    return json.loads(reply)
+
+
+if __name__ == '__main__':
+    # imports nothing of the toolchain, so it starts as fast as Python does
+    parser = argparse.ArgumentParser(description='build programs with a running toolchain_daemon.py')
+    parser.add_argument('sources', nargs='+', help='program directories, or single .jack files')
+    parser.add_argument('--socket', default='toolchain.sock', help='path of the daemon\'s Unix socket')
+    args = parser.parse_args()
+
+    failed = False
+    for arg in args.sources:
+        reply = request(args.socket, arg)
+        if reply['error'] is None:
+            print(f'{reply["hack"]}: {reply["seconds"] * 1000:.1f} ms')
+        else:
+            print(f'{arg}: {reply["error"]}')
+            failed = True
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,154 @@
+import os
+import sys
+import json
+import glob
+import time
+import signal
+import argparse
+import threading
+import socketserver
+
+from toolchain_build import ToolchainBuild
+from toolchain_cache import ToolchainCache
+
+
+class ToolchainDaemon:
+    # keeps the toolchain, its tables and its cache loaded between builds.
+    # Watched program directories are polled and rebuilt when a source
+    # changes; clients ask for builds over a Unix socket, one JSON request
+    # per line, one JSON reply per line
+    POLL_SECONDS = 0.2
+    # rebuilds reuse every unchanged artifact, so the daemon caches by default
+    CACHE_DIR = 'toolchain.cache'
+
+    def __init__(self, toolchain, socket_path, watched=(), poll_seconds=POLL_SECONDS):
+        self._toolchain = toolchain
+        self._socket_path = socket_path
+        self._poll_seconds = poll_seconds
+        # builds share the cache and the stages' singletons
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._server = None
+
+        self._snapshots = {os.path.abspath(source): None for source in watched}
+
+    @staticmethod
+    def _snapshot(source):
+        # the program's sources: its .jack files, or .vm files if it has
+        # none, since the .vm files of a Jack program are build outputs
+        if os.path.isfile(source):
+            files = [source]
+        else:
+            files = glob.glob(os.path.join(source, '*.jack')) or glob.glob(os.path.join(source, '*.vm'))
+
+        snapshot = {}
+        for file in files:
+            try:
+                stat = os.stat(file)
+            except FileNotFoundError:
+                continue
+            snapshot[file] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def build(self, source):
+        # any error is the build's, reported in the reply; the daemon and
+        # its watcher keep running
+        start = time.perf_counter()
+        try:
+            with self._lock:
+                hack_file = self._toolchain.build(source)
+            error = None
+        except Exception as e:
+            hack_file = None
+            error = f'{type(e).__name__}: {e}'
+        return {'source': source, 'hack': hack_file, 'seconds': time.perf_counter() - start, 'error': error}
+
+    def _report(self, reply):
+        if reply['error'] is None:
+            print(f'{reply["hack"]}: {reply["seconds"] * 1000:.1f} ms', flush=True)
+        else:
+            print(f'{reply["source"]}: {reply["error"]}', flush=True)
+
+    def _watch(self):
+        while not self._stopped.is_set():
+            for source, snapshot in self._snapshots.items():
+                # the snapshot is taken before the build, so an edit made
+                # while it runs is picked up by the next poll
+                new_snapshot = self._snapshot(source)
+                if new_snapshot != snapshot:
+                    self._snapshots[source] = new_snapshot
+                    self._report(self.build(source))
+            self._stopped.wait(self._poll_seconds)
+
+    def serve(self):
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        source = json.loads(line)['source']
+                    except (ValueError, KeyError, TypeError):
+                        source = None
+                    if isinstance(source, str):
+                        reply = daemon.build(source)
+                    else:
+                        reply = {'error': 'bad request, expected {"source": path}'}
+                    self.wfile.write(json.dumps(reply).encode() + b'\n')
+                    self.wfile.flush()
+
+        # a socket file left by a daemon that did not stop cleanly
+        if os.path.exists(self._socket_path):
+            os.remove(self._socket_path)
+
+        watcher = threading.Thread(target=self._watch, daemon=True)
+        watcher.start()
+        self._server = socketserver.ThreadingUnixStreamServer(self._socket_path, Handler)
+        self._server.daemon_threads = True
+        try:
+            self._server.serve_forever()
+        finally:
+            self._stopped.set()
+            self._server.server_close()
+            os.remove(self._socket_path)
+
+    def stop(self):
+        self._stopped.set()
+        if self._server is not None:
+            self._server.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='stay resident and rebuild programs as they change, '
+                                                 'or when toolchain_client.py asks')
+    parser.add_argument('watched', nargs='*', help='program directories, or single .jack files, to rebuild on change')
+    parser.add_argument('--socket', default='toolchain.sock', help='path of the Unix socket to listen on')
+    parser.add_argument('--poll', type=float, default=ToolchainDaemon.POLL_SECONDS, metavar='SECONDS',
+                        help='how often watched sources are checked')
+    parser.add_argument('--cache', metavar='DIR', default=ToolchainDaemon.CACHE_DIR,
+                        help=f'directory of the build cache, {ToolchainDaemon.CACHE_DIR} by default')
+    parser.add_argument('--no-cache', dest='cache', action='store_const', const=None,
+                        help='rebuild everything on each change')
+    parser.add_argument('--cache-size', type=int, default=ToolchainCache.MAX_BYTES // (1024 * 1024), metavar='MB')
+    parser.add_argument('--os', default=ToolchainBuild.OS_DIR, help='directory of the OS .vm files')
+    parser.add_argument('--no-os', dest='os', action='store_const', const=None, help='do not link in the OS')
+    parser.add_argument('--optimize-jack', action='store_true', help='fold constants in the Jack compiler')
+    parser.add_argument('-O', '--optimize', action='store_true', help='run the peephole optimizer on the .asm')
+    parser.add_argument('--compact', action='store_true', help='share call, return and compare routines')
+    parser.add_argument('--no-comments', dest='comments', action='store_false',
+                        help='do not echo each VM command as a comment')
+    parser.add_argument('--drop-unreachable', action='store_true',
+                        help='leave out functions not reachable from Sys.init')
+    args = parser.parse_args()
+
+    cache = None if args.cache is None else ToolchainCache(args.cache, args.cache_size * 1024 * 1024)
+    toolchain = ToolchainBuild(cache, args.os, args.optimize_jack, args.optimize, args.compact, args.comments,
+                               args.drop_unreachable)
+    daemon = ToolchainDaemon(toolchain, args.socket, args.watched, args.poll)
+    print(f'listening on {args.socket}', flush=True)
+    # a plain kill also goes through serve()'s clean-up
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        daemon.serve()
+    except KeyboardInterrupt:
+        sys.exit(0)
@@ -0,0 +1,143 @@
+import sys
+import json
+import time
+import pstats
+import cProfile
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+class Phase:
+    # one timed run of a phase; counts are what it processed, such as
+    # lines, tokens or instructions
+    __slots__ = ('name', 'subject', 'counts', 'seconds', 'peak_kb', '_start')
+
+    def __init__(self, name, subject):
+        self.name = name
+        self.subject = subject
+        self.counts = {}
+        self.seconds = 0.0
+        self.peak_kb = None
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.seconds = time.perf_counter() - self._start
+        # the process's peak resident size so far, free to read
+        if resource is not None:
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.peak_kb = peak // 1024 if sys.platform == 'darwin' else peak
+        Instrumentation.phases.append(self)
+        return False
+
+
+class _DisabledPhase:
+    # what phase() hands out while disabled: nothing is timed or kept
+    __slots__ = ()
+    counts = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class Instrumentation:
+    # opt-in per-phase measurements. Phases are whole files or passes, so
+    # while disabled a phase costs one with statement and nothing else;
+    # counts that take work to compute are guarded by enabled
+    enabled = False
+    phases = []
+    _disabled_phase = _DisabledPhase()
+
+    @classmethod
+    def enable(cls):
+        cls.enabled = True
+        cls.phases = []
+
+    @classmethod
+    def phase(cls, name, subject=''):
+        if not cls.enabled:
+            return cls._disabled_phase
+        return Phase(name, subject)
+
+    @classmethod
+    def counted(cls, lines, phase, name):
+        # lines as they are while disabled; while enabled, the same lines
+        # counted into phase as they are read, so a count needs no pass of
+        # its own
+        if not cls.enabled:
+            return lines
+        return cls._count(lines, phase.counts, name)
+
+    @staticmethod
+    def _count(lines, counts, name):
+        counts[name] = 0
+        for line in lines:
+            counts[name] += 1
+            yield line
+
+    @classmethod
+    def totals(cls):
+        # phase name -> runs, seconds, summed counts, peak memory
+        totals = {}
+        for phase in cls.phases:
+            total = totals.setdefault(phase.name, {'runs': 0, 'seconds': 0.0, 'counts': {}, 'peak_kb': None})
+            total['runs'] += 1
+            total['seconds'] += phase.seconds
+            for key, value in phase.counts.items():
+                total['counts'][key] = total['counts'].get(key, 0) + value
+            if phase.peak_kb is not None:
+                total['peak_kb'] = max(total['peak_kb'] or 0, phase.peak_kb)
+        return totals
+
+    @classmethod
+    def report(cls):
+        return {
+            'phases': [{'name': phase.name, 'subject': phase.subject, 'seconds': phase.seconds,
+                        'counts': phase.counts, 'peak_kb': phase.peak_kb} for phase in cls.phases],
+            'totals': cls.totals()
+        }
+
+    @classmethod
+    def summary(cls):
+        lines = []
+        for name, total in cls.totals().items():
+            seconds = total['seconds']
+            rates = ', '.join(f'{value} {key}' + (f' ({value / seconds:,.0f}/s)' if seconds else '')
+                              for key, value in total['counts'].items())
+            peak = '' if total['peak_kb'] is None else f', peak {total["peak_kb"] / 1024:.1f} MB'
+            lines.append(f'{name}: {total["runs"]} runs, {seconds * 1000:.1f} ms' +
+                         (f', {rates}' if rates else '') + peak)
+        return lines
+
+    @classmethod
+    def run(cls, function, json_file=None, profile_file=None):
+        # runs a CLI's work with measurements to json_file and cProfile
+        # stats to profile_file, each only if given; summaries go to stderr
+        if json_file is not None:
+            cls.enable()
+        profiler = None
+        if profile_file is not None:
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        try:
+            return function()
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(profile_file)
+                pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(20)
+            if json_file is not None:
+                output = open(json_file, 'w')
+                json.dump(cls.report(), output, indent=2)
+                output.close()
+                print('\n'.join(cls.summary()), file=sys.stderr)